@@ -1,8 +1,14 @@
 from dashscope import Generation
-from typing import Dict, Any, Tuple
+from typing import Dict, Any, List, Optional, Tuple, Union
 from config import settings
 from threat_intel import ThreatIntel
 from response_actions import ResponseActions
+from profiler import upstream_timer
+from concurrency import get_limiter
+from prompt_packing import Decision, PromptPacker
+from progress_journal import ProgressJournal
+from similarity_index import SimilarityIndex, alert_features
+from alert_normalizer import NormalizedAlert, normalize_alert
 import re
 import logging
 import json
@@ -29,17 +35,50 @@ class AIAnalyzer:
         threat_intel: 威胁情报服务实例
         response_actions: 响应动作服务实例
         analysis_prompt_template: 告警分析提示模板
+        packed_prompt_template: 多告警合并分析提示模板
+        packer: 告警合并分析器，未开启合并分析时为None
+        similarity_index: 近似重复告警索引，未开启结论复用时为None
+        alert_format: 告警格式名称，为None时对每条告警自动检测
     """
     
-    def __init__(self):
+    def __init__(
+        self,
+        pack_size: Optional[int] = None,
+        pack_max_wait: Optional[float] = None,
+        reuse_similar: Optional[bool] = None,
+        alert_format: Optional[str] = None
+    ):
         """
         初始化AI分析服务
         
         设置威胁情报服务和响应动作服务，
         并配置告警分析提示模板
+        
+        参数:
+            pack_size: 单次调用合并分析的最大告警数，为空或1时不合并；只有多个线程并发
+                提交告警时合并才有意义，单条分析的命令不应开启
+            pack_max_wait: 告警等待合并的最长时间（秒），默认读取配置
+            reuse_similar: 是否复用近似重复告警的分析结论，默认读取配置
+            alert_format: 告警格式名称，批量处理同一来源的告警时指定可避免逐条检测
         """
         self.threat_intel = ThreatIntel()
         self.response_actions = ResponseActions()
+        self.alert_format = alert_format
+        
+        pack_max_wait = pack_max_wait if pack_max_wait is not None else settings.ANALYSIS_PACK_MAX_WAIT
+        self.packer = PromptPacker(
+            self._analyze_packed,
+            self._analyze_single,
+            max_size=pack_size,
+            max_wait=pack_max_wait
+        ) if pack_size is not None and pack_size > 1 else None
+        
+        reuse_similar = reuse_similar if reuse_similar is not None else settings.SIMILARITY_REUSE
+        self.similarity_index = SimilarityIndex(
+            threshold=settings.SIMILARITY_THRESHOLD,
+            capacity=settings.SIMILARITY_INDEX_SIZE,
+            path=settings.SIMILARITY_INDEX_PATH
+        ) if reuse_similar else None
         
         # 告警分析提示模板
         self.analysis_prompt_template = """
@@ -63,8 +102,27 @@ class AIAnalyzer:
         响应决策：[是/否]
         决策原因：[原因说明]
         """
+        
+        # 多告警合并分析提示模板
+        self.packed_prompt_template = """
+        你是一个专业的安全运营分析师。以下是若干条互不相关的安全告警，每条告警都有唯一的告警ID。
+        请分别独立分析每条告警，不要把不同告警的信息混在一起。
+
+        {alerts}
+
+        对每条告警，请提供以下分析：
+        1. 告警概述：简要说明这个告警是什么
+        2. 威胁等级评估：评估这个告警的严重程度（高/中/低）
+        3. 攻击者分析：分析攻击者的特征和行为
+        4. 影响范围：分析可能受到影响的系统和数据
+        5. 建议的响应措施：提供具体的处置建议
+        6. 响应决策：根据分析结果，给出是否应该执行响应动作的决策，并说明原因
+
+        请只输出一个JSON数组，每条告警对应一个元素，不要输出其他内容，格式为：
+        [{{"id": "告警ID", "analysis": "中文Markdown格式的分析报告（第1-5项）", "should_respond": true或false, "reason": "决策原因"}}]
+        """
     
-    def _extract_decision(self, analysis: str) -> Tuple[bool, str]:
+    def _extract_decision(self, analysis: str) -> Tuple[Optional[bool], str]:
         """
         从分析结果中提取响应决策
         
@@ -72,7 +130,7 @@ class AIAnalyzer:
             analysis: AI分析结果文本
             
         返回:
-            Tuple[bool, str]: (是否执行响应动作, 决策原因)
+            Tuple[Optional[bool], str]: (是否执行响应动作, 决策原因)，无法提取时是否执行响应动作为None
         """
         # 使用正则表达式匹配响应决策
         decision_pattern = r"响应决策：([是|否])\s*决策原因：(.*?)(?=\n|$)"
@@ -92,34 +150,54 @@ class AIAnalyzer:
             reason = match.group(2).strip()
             return decision, reason
             
-        return False, "无法从分析结果中提取决策信息"
+        return None, "无法从分析结果中提取决策信息"
     
-    def _format_alert(self, alert: Dict[str, Any]) -> str:
+    def normalize(self, alert: Union[Dict[str, Any], NormalizedAlert]) -> NormalizedAlert:
+        """
+        把原始告警归一化为扁平记录，已归一化的记录原样返回
+        
+        参数:
+            alert: 原始告警信息或归一化记录
+            
+        返回:
+            NormalizedAlert: 归一化后的告警记录
+        """
+        if isinstance(alert, NormalizedAlert):
+            return alert
+        return normalize_alert(alert, self.alert_format)
+    
+    def _format_alert(self, alert: Union[Dict[str, Any], NormalizedAlert]) -> str:
         """
         格式化告警信息，提取关键字段
         
         参数:
-            alert: 原始告警信息
+            alert: 原始告警信息或归一化记录
             
         返回:
             str: 格式化后的告警信息
         """
         try:
-            # 提取关键字段
-            event = alert.get("event", {})
-            source = event.get("source", {})
-            target = event.get("target", {})
+            record = self.normalize(alert)
             
             formatted_alert = {
-                "告警类型": alert.get("alert_type", "未知"),
-                "告警时间": alert.get("timestamp", "未知"),
-                "源IP": source.get("ip", "未知"),
-                "源端口": source.get("port", "未知"),
-                "目标IP": target.get("ip", "未知"),
-                "目标端口": target.get("port", "未知"),
-                "协议": event.get("protocol", "未知"),
-                "事件描述": event.get("description", "未知")
+                "告警类型": record.alert_type,
+                "告警时间": record.timestamp,
+                "源IP": record.source_ip,
+                "源端口": record.source_port,
+                "目标IP": record.target_ip,
+                "目标端口": record.target_port,
+                "协议": record.protocol,
+                "事件描述": record.description
+            }
+            formatted_alert = {key: "未知" if value is None else value for key, value in formatted_alert.items()}
+            # 以下字段只在告警中存在时提供给模型
+            optional_fields = {
+                "严重程度": record.severity,
+                "规则ID": record.rule_id,
+                "目标服务": record.target_service,
+                "原始日志": record.raw_log
             }
+            formatted_alert.update((key, value) for key, value in optional_fields.items() if value is not None)
             
             return json.dumps(formatted_alert, ensure_ascii=False, indent=2)
         except Exception as e:
@@ -131,21 +209,25 @@ class AIAnalyzer:
         格式化威胁情报信息，提取关键字段
         
         参数:
-            threat_intel: 原始威胁情报信息
+            threat_intel: 精简后的威胁情报记录
             
         返回:
             str: 格式化后的威胁情报信息
         """
         try:
+            ip_info = threat_intel.get("ip_info", {})
+            vt_report = threat_intel.get("vt_report", {})
             formatted_intel = {
                 "IP信息": {
-                    "国家": threat_intel.get("ip_info", {}).get("country", "未知"),
-                    "城市": threat_intel.get("ip_info", {}).get("city", "未知"),
-                    "ISP": threat_intel.get("ip_info", {}).get("org", "未知")
+                    "国家": ip_info.get("country") or "未知",
+                    "城市": ip_info.get("city") or "未知",
+                    "ISP": ip_info.get("org") or "未知"
                 },
                 "威胁情报": {
-                    "恶意评分": threat_intel.get("vt_report", {}).get("data", {}).get("attributes", {}).get("last_analysis_stats", {}).get("malicious", 0),
-                    "可疑评分": threat_intel.get("vt_report", {}).get("data", {}).get("attributes", {}).get("last_analysis_stats", {}).get("suspicious", 0)
+                    "恶意评分": vt_report.get("malicious", 0),
+                    "可疑评分": vt_report.get("suspicious", 0),
+                    "恶意URL数": vt_report.get("detected_urls", 0),
+                    "恶意样本数": vt_report.get("detected_samples", 0)
                 }
             }
             
@@ -154,74 +236,194 @@ class AIAnalyzer:
             logger.error(f"格式化威胁情报失败: {str(e)}")
             return str(threat_intel)
     
-    def analyze_alert(self, alert: Dict[str, Any]) -> Dict[str, Any]:
+    def enrich_alert(self, alert: Union[Dict[str, Any], NormalizedAlert]) -> Dict[str, Any]:
         """
-        分析安全告警并生成响应建议
+        获取告警源IP的威胁情报
         
         参数:
-            alert: 包含告警信息的字典
+            alert: 原始告警信息或归一化记录
             
         返回:
-            Dict[str, Any]: 包含分析结果、威胁情报和响应决策的字典
+            Dict[str, Any]: 精简后的威胁情报记录，包含IP信息和VirusTotal检出统计
         """
-        try:
-            # 获取威胁情报
-            source_ip = alert["event"]["source"]["ip"]
-            threat_intel = {
-                "ip_info": self.threat_intel.get_ip_info(source_ip),
-                "vt_report": self.threat_intel.get_vt_ip_report(source_ip)
-            }
-            
-            # 格式化告警和威胁情报信息
-            formatted_alert = self._format_alert(alert)
-            formatted_threat_intel = self._format_threat_intel(threat_intel)
-            
-            # 构建提示
-            prompt = self.analysis_prompt_template.format(
-                alert=formatted_alert,
-                threat_intel=formatted_threat_intel
-            )
-            
-            logger.info("正在调用通义千问API...")
+        source_ip = self.normalize(alert).source_ip
+        if not source_ip:
+            raise ValueError("告警中缺少源IP")
+        record = self.threat_intel.lookup_ip(source_ip, keep_raw=settings.KEEP_RAW_THREAT_INTEL)
+        return record.to_dict()
+    
+    def _call_llm(self, prompt: str, max_tokens: int = 2000, limiter: str = "dashscope") -> str:
+        """
+        调用通义千问API
+        
+        参数:
+            prompt: 提示内容
+            max_tokens: 最大输出token数
+            limiter: 使用的并发限制器名称，延迟差异较大的调用应使用不同的限制器
             
-            # 调用通义千问API
-            try:
+        返回:
+            str: 模型输出文本
+        """
+        logger.info("正在调用通义千问API...")
+        try:
+            with get_limiter(limiter).slot() as slot, upstream_timer(limiter):
                 response = Generation.call(
                     model="qwen-max",
                     prompt=prompt,
                     temperature=0.7,
                     api_key=settings.DASHSCOPE_API_KEY,
                     result_format='message',
-                    max_tokens=2000,
+                    max_tokens=max_tokens,
                     top_p=0.8,
-                    enable_search=True
+                    enable_search=True,
+                    request_timeout=settings.LLM_TIMEOUT
                 )
-                
-                if not response or not response.output or not response.output.choices:
-                    raise Exception("API返回结果无效")
-                
-                analysis_result = response.output.choices[0].message.content
-                logger.info("成功获取分析结果")
-                
-                # 提取响应决策
-                should_respond, decision_reason = self._extract_decision(analysis_result)
-                
-                return {
-                    "analysis": analysis_result,
-                    "threat_intel": threat_intel,
-                    "response_decision": {
-                        "should_respond": should_respond,
-                        "reason": decision_reason
+                slot.observe_status(getattr(response, "status_code", None))
+            
+            if not response or not response.output or not response.output.choices:
+                raise Exception("API返回结果无效")
+            
+            content = response.output.choices[0].message.content
+            logger.info("成功获取分析结果")
+            return content
+        except Exception as api_error:
+            logger.error(f"API调用失败: {str(api_error)}")
+            raise
+    
+    def _analyze_single(self, formatted_alert: str, formatted_threat_intel: str) -> Tuple[str, Optional[bool], str]:
+        """
+        单独分析一条告警
+        
+        参数:
+            formatted_alert: 格式化后的告警信息
+            formatted_threat_intel: 格式化后的威胁情报信息
+            
+        返回:
+            Tuple[str, Optional[bool], str]: (分析报告, 是否执行响应动作, 决策原因)，无法提取决策时是否执行响应动作为None
+        """
+        prompt = self.analysis_prompt_template.format(
+            alert=formatted_alert,
+            threat_intel=formatted_threat_intel
+        )
+        analysis_result = self._call_llm(prompt)
+        should_respond, decision_reason = self._extract_decision(analysis_result)
+        return analysis_result, should_respond, decision_reason
+    
+    def _analyze_packed(self, items: List[Tuple[str, str, str]]) -> Dict[str, Decision]:
+        """
+        在一次调用中合并分析多条告警
+        
+        参数:
+            items: (告警ID, 格式化后的告警信息, 格式化后的威胁情报信息)列表
+            
+        返回:
+            Dict[str, Decision]: 以告警ID为键的(分析报告, 是否执行响应动作, 决策原因)
+        """
+        sections = [
+            f"告警ID：{alert_id}\n告警信息：\n{alert}\n威胁情报信息：\n{threat_intel}"
+            for alert_id, alert, threat_intel in items
+        ]
+        prompt = self.packed_prompt_template.format(alerts="\n\n".join(sections))
+        # 合并调用的延迟是单条调用的数倍，使用单独的限制器，避免拉低单条调用的并发上限
+        content = self._call_llm(prompt, max_tokens=min(2000 * len(items), 8000), limiter="dashscope_packed")
+        return self._parse_packed_decisions(content, {alert_id for alert_id, _, _ in items})
+    
+    def _parse_packed_decisions(self, content: str, expected_ids: set) -> Dict[str, Decision]:
+        """
+        解析合并分析的JSON数组输出
+        
+        参数:
+            content: 模型输出文本，允许包含Markdown代码块等额外内容
+            expected_ids: 本次提交的告警ID集合
+            
+        返回:
+            Dict[str, Decision]: 以告警ID为键的结果，格式不正确的元素会被忽略
+        """
+        start, end = content.find("["), content.rfind("]")
+        if start == -1 or end <= start:
+            raise ValueError("合并分析结果中没有JSON数组")
+        decisions: Dict[str, Decision] = {}
+        for entry in json.loads(content[start:end + 1]):
+            if not isinstance(entry, dict) or entry.get("id") not in expected_ids:
+                continue
+            if not isinstance(entry.get("analysis"), str) or not isinstance(entry.get("should_respond"), bool):
+                continue
+            decisions[entry["id"]] = (entry["analysis"], entry["should_respond"], str(entry.get("reason", "")))
+        return decisions
+    
+    def analyze_alert(
+        self,
+        alert: Dict[str, Any],
+        threat_intel: Optional[Dict[str, Any]] = None,
+        record: Optional[NormalizedAlert] = None
+    ) -> Dict[str, Any]:
+        """
+        分析安全告警并生成响应建议
+        
+        参数:
+            alert: 包含告警信息的字典
+            threat_intel: 已获取的威胁情报，为空时重新查询
+            record: 已归一化的告警记录，为空时重新归一化
+            
+        返回:
+            Dict[str, Any]: 包含分析结果、威胁情报和响应决策的字典
+        """
+        try:
+            if record is None:
+                record = self.normalize(alert)
+            
+            # 获取威胁情报
+            if threat_intel is None:
+                threat_intel = self.enrich_alert(record)
+            
+            # 复用近似重复告警的分析结论
+            if self.similarity_index is not None:
+                features = alert_features(record, threat_intel)
+                match = self.similarity_index.query(features)
+                if match is not None:
+                    entry_id, similarity, previous = match
+                    logger.info(f"复用相似告警 {entry_id[:12]} 的分析结论（相似度 {similarity:.2f}）")
+                    return {
+                        "analysis": previous["analysis"],
+                        "threat_intel": threat_intel,
+                        "response_decision": previous["response_decision"],
+                        "reused_from": {"alert_id": entry_id, "similarity": similarity}
                     }
+            
+            # 格式化告警和威胁情报信息
+            formatted_alert = self._format_alert(record)
+            formatted_threat_intel = self._format_threat_intel(threat_intel)
+            
+            if self.packer is not None:
+                analysis_result, should_respond, decision_reason = self.packer.analyze(
+                    formatted_alert, formatted_threat_intel
+                )
+            else:
+                analysis_result, should_respond, decision_reason = self._analyze_single(
+                    formatted_alert, formatted_threat_intel
+                )
+            
+            result = {
+                "analysis": analysis_result,
+                "threat_intel": threat_intel,
+                "response_decision": {
+                    "should_respond": bool(should_respond),
+                    "reason": decision_reason
                 }
-            except Exception as api_error:
-                logger.error(f"API调用失败: {str(api_error)}")
-                raise
+            }
+            # 无法提取决策的结论不能复用，否则会把解析失败扩散到相似告警
+            if self.similarity_index is not None and should_respond is not None:
+                self.similarity_index.add(ProgressJournal.digest(alert), features, {
+                    "analysis": analysis_result,
+                    "response_decision": result["response_decision"]
+                })
+            return result
             
         except Exception as e:
             logger.error(f"分析过程出错: {str(e)}")
             return {
                 "analysis": f"AI分析出错：{str(e)}",
+                "error": str(e),
                 "threat_intel": {},
                 "response_decision": {
                     "should_respond": False,
@@ -229,14 +431,17 @@ class AIAnalyzer:
                 }
             }
     
-    def execute_response(self, ip: str) -> Dict[str, Any]:
+    def execute_response(self, ip: str, idempotency_key: Optional[str] = None) -> Dict[str, Any]:
         """
         执行响应动作
         
         参数:
             ip: 要执行响应动作的IP地址
+            idempotency_key: 幂等键，用于避免恢复执行时重复封锁
             
         返回:
             Dict[str, Any]: 包含响应动作执行结果的字典
         """
-        return self.response_actions.block_ip(ip) 
\ No newline at end of file
+        if idempotency_key:
+            return self.response_actions.block_ip(ip, idempotency_key=idempotency_key)
+        return self.response_actions.block_ip(ip)
@@ -0,0 +1,281 @@
+from dataclasses import dataclass, fields
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+@dataclass(slots=True)
+class NormalizedAlert:
+    """
+    归一化后的扁平告警记录
+
+    提示构建、威胁情报查询、相似度特征和响应动作都使用这一记录，
+    缺失的字段为None。
+
+    属性:
+        format: 告警来源格式
+        alert_type: 告警类型
+        timestamp: 告警时间
+        severity: 严重程度
+        rule_id: 规则ID
+        rule_name: 规则名称
+        description: 事件描述
+        source_ip: 源IP
+        source_port: 源端口
+        target_ip: 目标IP
+        target_port: 目标端口
+        target_service: 目标服务/应用层协议
+        protocol: 传输层协议
+        raw_log: 原始日志
+        event_id: 事件ID
+    """
+    format: str
+    alert_type: Any = None
+    timestamp: Any = None
+    severity: Any = None
+    rule_id: Any = None
+    rule_name: Any = None
+    description: Any = None
+    source_ip: Any = None
+    source_port: Any = None
+    target_ip: Any = None
+    target_port: Any = None
+    target_service: Any = None
+    protocol: Any = None
+    raw_log: Any = None
+    event_id: Any = None
+
+# 可由字段映射填充的字段（除format外）
+_FIELDS = tuple(f.name for f in fields(NormalizedAlert) if f.name != "format")
+
+def _compile_path(path: str) -> Callable[[Dict[str, Any]], Any]:
+    """把以点分隔的字段路径编译为取值函数，路径不存在时返回None"""
+    keys = tuple(path.split("."))
+
+    def get(alert: Dict[str, Any]) -> Any:
+        value = alert
+        try:
+            for key in keys:
+                value = value[key]
+        except (KeyError, TypeError, IndexError):
+            return None
+        return value
+
+    return get
+
+def _compile_plan(name: str, mapping: Dict[str, Tuple[str, ...]]) -> Callable[[Dict[str, Any]], NormalizedAlert]:
+    """
+    把字段映射编译为投影函数
+
+    参数:
+        name: 格式名称
+        mapping: 归一化字段到候选路径的映射，按顺序取第一个非空值
+
+    返回:
+        Callable[[Dict[str, Any]], NormalizedAlert]: 投影函数
+    """
+    unknown = set(mapping) - set(_FIELDS)
+    if unknown:
+        raise ValueError(f"未知的归一化字段: {', '.join(sorted(unknown))}")
+    plan = [(field, tuple(_compile_path(path) for path in mapping[field])) for field in _FIELDS if field in mapping]
+
+    def project(alert: Dict[str, Any]) -> NormalizedAlert:
+        record = NormalizedAlert(name)
+        for field, getters in plan:
+            for get in getters:
+                value = get(alert)
+                if value is not None:
+                    setattr(record, field, value)
+                    break
+        return record
+
+    return project
+
+class AlertNormalizer:
+    """
+    单一告警格式的归一化器
+
+    属性:
+        name: 格式名称
+        detect: 判断告警是否属于该格式的函数
+        project: 编译后的字段投影函数
+    """
+
+    def __init__(self, name: str, detect: Callable[[Dict[str, Any]], bool], mapping: Dict[str, Tuple[str, ...]]):
+        """
+        初始化归一化器
+
+        参数:
+            name: 格式名称
+            detect: 判断告警是否属于该格式的函数
+            mapping: 归一化字段到候选路径的映射
+        """
+        self.name = name
+        self.detect = detect
+        self.project = _compile_plan(name, mapping)
+
+    def normalize(self, alert: Dict[str, Any]) -> NormalizedAlert:
+        """
+        归一化一条告警
+
+        参数:
+            alert: 原始告警信息
+
+        返回:
+            NormalizedAlert: 归一化后的告警记录
+        """
+        return self.project(alert)
+
+# 已注册的归一化器，按注册顺序检测，generic始终位于最后
+_normalizers: List[AlertNormalizer] = []
+
+def register_normalizer(
+    name: str,
+    detect: Callable[[Dict[str, Any]], bool],
+    mapping: Dict[str, Tuple[str, ...]]
+) -> AlertNormalizer:
+    """
+    注册告警格式归一化器，新注册的格式在generic之前检测
+
+    参数:
+        name: 格式名称
+        detect: 判断告警是否属于该格式的函数
+        mapping: 归一化字段到候选路径的映射
+
+    返回:
+        AlertNormalizer: 归一化器实例
+    """
+    normalizer = AlertNormalizer(name, detect, mapping)
+    position = len(_normalizers)
+    if _normalizers and _normalizers[-1].name == "generic":
+        position -= 1
+    _normalizers.insert(position, normalizer)
+    return normalizer
+
+def get_normalizer(name: str) -> AlertNormalizer:
+    """
+    按名称获取归一化器
+
+    参数:
+        name: 格式名称
+
+    返回:
+        AlertNormalizer: 归一化器实例
+    """
+    for normalizer in _normalizers:
+        if normalizer.name == name:
+            return normalizer
+    raise ValueError(f"未知的告警格式: {name}")
+
+def detect_normalizer(alert: Dict[str, Any]) -> AlertNormalizer:
+    """
+    检测告警格式
+
+    参数:
+        alert: 原始告警信息
+
+    返回:
+        AlertNormalizer: 第一个匹配的归一化器，都不匹配时为generic
+    """
+    for normalizer in _normalizers:
+        if normalizer.detect(alert):
+            return normalizer
+    return get_normalizer("generic")
+
+def _has_nested(alert: Dict[str, Any], outer: str, inner: str) -> bool:
+    """判断告警中是否存在alert[outer][inner]"""
+    value = alert.get(outer)
+    return isinstance(value, dict) and inner in value
+
+register_normalizer(
+    "elastic_ecs",
+    lambda alert: "ecs" in alert or ("@timestamp" in alert and ("source" in alert or "destination" in alert)),
+    {
+        "alert_type": ("rule.name", "event.action"),
+        "timestamp": ("@timestamp",),
+        "severity": ("event.severity",),
+        "rule_id": ("rule.id",),
+        "rule_name": ("rule.name",),
+        "description": ("rule.description", "event.reason", "message"),
+        "source_ip": ("source.ip",),
+        "source_port": ("source.port",),
+        "target_ip": ("destination.ip",),
+        "target_port": ("destination.port",),
+        "target_service": ("network.protocol", "service.name"),
+        "protocol": ("network.transport",),
+        "raw_log": ("event.original", "message"),
+        "event_id": ("event.id",),
+    }
+)
+
+register_normalizer(
+    "wazuh",
+    lambda alert: _has_nested(alert, "event", "rule") or ("rule" in alert and "agent" in alert),
+    {
+        "alert_type": ("event.rule.name", "rule.description"),
+        "timestamp": ("event.timestamp", "timestamp"),
+        "severity": ("event.severity", "rule.level"),
+        "rule_id": ("event.rule.id", "rule.id"),
+        "rule_name": ("event.rule.name", "rule.description"),
+        "description": ("event.rule.description", "event.description", "rule.description"),
+        "source_ip": ("event.source.ip", "data.srcip"),
+        "source_port": ("event.source.port", "data.srcport"),
+        "target_ip": ("event.target.ip", "data.dstip", "agent.ip"),
+        "target_port": ("event.target.port", "data.dstport"),
+        "target_service": ("event.target.service", "decoder.name"),
+        "protocol": ("event.protocol", "data.protocol"),
+        "raw_log": ("event.raw_log.original", "full_log"),
+        "event_id": ("event.event_id", "id"),
+    }
+)
+
+register_normalizer(
+    "suricata_eve",
+    lambda alert: alert.get("event_type") == "alert" and "src_ip" in alert,
+    {
+        "alert_type": ("alert.signature",),
+        "timestamp": ("timestamp",),
+        "severity": ("alert.severity",),
+        "rule_id": ("alert.signature_id",),
+        "rule_name": ("alert.signature",),
+        "description": ("alert.category",),
+        "source_ip": ("src_ip",),
+        "source_port": ("src_port",),
+        "target_ip": ("dest_ip",),
+        "target_port": ("dest_port",),
+        "target_service": ("app_proto",),
+        "protocol": ("proto",),
+        "raw_log": ("payload_printable",),
+        "event_id": ("flow_id",),
+    }
+)
+
+register_normalizer(
+    "generic",
+    lambda alert: True,
+    {
+        "alert_type": ("alert_type",),
+        "timestamp": ("timestamp", "event.timestamp"),
+        "severity": ("severity", "event.severity"),
+        "description": ("event.description", "description"),
+        "source_ip": ("event.source.ip", "source_ip"),
+        "source_port": ("event.source.port", "source_port"),
+        "target_ip": ("event.target.ip", "target_ip"),
+        "target_port": ("event.target.port", "target_port"),
+        "target_service": ("event.target.service",),
+        "protocol": ("event.protocol", "protocol"),
+        "raw_log": ("event.raw_log.original", "raw_log"),
+        "event_id": ("event.event_id", "event_id"),
+    }
+)
+
+def normalize_alert(alert: Dict[str, Any], alert_format: Optional[str] = None) -> NormalizedAlert:
+    """
+    归一化一条告警
+
+    参数:
+        alert: 原始告警信息
+        alert_format: 告警格式名称，为空时自动检测
+
+    返回:
+        NormalizedAlert: 归一化后的告警记录
+    """
+    normalizer = get_normalizer(alert_format) if alert_format else detect_normalizer(alert)
+    return normalizer.normalize(alert)
@@ -0,0 +1,196 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+from config import settings
+
+# 视为上游限流、过载或超时的HTTP状态码
+THROTTLE_STATUS_CODES = (408, 429, 503, 504)
+
+class _Slot:
+    """单次上游调用的观测结果，由调用方标记是否被限流"""
+
+    __slots__ = ("throttled", "contended")
+
+    def __init__(self, contended: bool = False):
+        self.throttled = False
+        # 获取名额时并发已达到上限，只有这种情况下成功的调用才会提高上限
+        self.contended = contended
+
+    def observe_status(self, status_code: Any) -> None:
+        """
+        根据响应状态码判断是否被限流
+
+        参数:
+            status_code: HTTP状态码
+        """
+        if status_code in THROTTLE_STATUS_CODES:
+            self.throttled = True
+
+    def observe_response(self, response: Any) -> None:
+        """
+        根据HTTP响应判断是否被限流
+
+        除限流状态码外，没有响应体的204也视为限流：VirusTotal v2接口在超出配额或速率限制时
+        返回204和空响应体，而不是429。
+
+        参数:
+            response: requests的响应对象
+        """
+        self.observe_status(response.status_code)
+        if response.status_code == 204 or not response.content:
+            self.throttled = True
+
+class AdaptiveLimiter:
+    """
+    自适应并发限制器（AIMD）
+
+    根据上游服务的实际表现动态调整允许同时进行的调用数：
+    - 并发已达到上限且延迟稳定时，每次调用成功后加性增加，约每轮并发增加1；
+      调用方自身并发不足时不提高上限
+    - 近期延迟（短窗口指数移动平均）明显高于长期延迟（长窗口指数移动平均）时小幅乘性减少，
+      单次调用延迟的正常波动不会触发减少
+    - 遇到限流或超时（408/429/503/504）、请求异常时大幅乘性减少
+
+    属性:
+        name: 上游服务名称
+        limit: 当前并发上限
+        min_limit: 并发上限的最小值
+        max_limit: 并发上限的最大值
+    """
+
+    def __init__(
+        self,
+        name: str,
+        initial_limit: int = 4,
+        min_limit: int = 1,
+        max_limit: int = 32,
+        backoff_ratio: float = 0.5,
+        latency_tolerance: float = 2.0,
+        short_window: int = 10,
+        long_window: int = 200
+    ):
+        """
+        初始化限制器
+
+        参数:
+            name: 上游服务名称
+            initial_limit: 初始并发上限
+            min_limit: 并发上限的最小值
+            max_limit: 并发上限的最大值
+            backoff_ratio: 出错时并发上限的缩减比例
+            latency_tolerance: 近期延迟超过长期延迟多少倍时视为过载
+            short_window: 近期延迟的平滑窗口（调用次数）
+            long_window: 长期延迟的平滑窗口（调用次数）
+        """
+        self.name = name
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff_ratio = backoff_ratio
+        self.latency_tolerance = latency_tolerance
+        self._short_alpha = 2 / (short_window + 1)
+        self._long_alpha = 2 / (long_window + 1)
+        self._short_latency: Optional[float] = None
+        self._long_latency: Optional[float] = None
+        self._in_flight = 0
+        self._samples = 0
+        self._drops = 0
+        self._condition = threading.Condition()
+
+    @contextmanager
+    def slot(self) -> Iterator[_Slot]:
+        """
+        获取一个调用名额，并在调用结束后根据延迟和结果调整并发上限
+
+        返回:
+            Iterator[_Slot]: 可用于标记限流状态的观测对象
+        """
+        with self._condition:
+            contended = self._in_flight >= int(self.limit)
+            while self._in_flight >= int(self.limit):
+                self._condition.wait()
+            self._in_flight += 1
+            contended = contended or self._in_flight >= int(self.limit)
+        observation = _Slot(contended)
+        start = time.perf_counter()
+        failed = False
+        try:
+            yield observation
+        except Exception:
+            failed = True
+            raise
+        finally:
+            self._release(time.perf_counter() - start, failed or observation.throttled, observation.contended)
+
+    def _release(self, latency: float, dropped: bool, contended: bool) -> None:
+        """释放名额并更新并发上限"""
+        with self._condition:
+            self._in_flight -= 1
+            self._samples += 1
+            if dropped:
+                self._drops += 1
+                self.limit = max(self.min_limit, self.limit * self.backoff_ratio)
+            else:
+                if self._short_latency is None or self._long_latency is None:
+                    self._short_latency = self._long_latency = latency
+                else:
+                    self._short_latency += (latency - self._short_latency) * self._short_alpha
+                    self._long_latency += (latency - self._long_latency) * self._long_alpha
+                if self._short_latency > self._long_latency * self.latency_tolerance:
+                    self.limit = max(self.min_limit, self.limit * 0.9)
+                elif contended:
+                    self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            self._condition.notify_all()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        获取限制器当前状态
+
+        返回:
+            Dict[str, Any]: 包含并发上限、进行中调用数、长期延迟等指标的字典
+        """
+        with self._condition:
+            return {
+                "limit": int(self.limit),
+                "in_flight": self._in_flight,
+                "baseline_latency": self._long_latency,
+                "samples": self._samples,
+                "drops": self._drops
+            }
+
+_limiters: Dict[str, AdaptiveLimiter] = {}
+_limiters_lock = threading.Lock()
+
+def get_limiter(name: str) -> AdaptiveLimiter:
+    """
+    获取指定上游服务的共享限制器，不存在时按配置创建
+
+    参数:
+        name: 上游服务名称
+
+    返回:
+        AdaptiveLimiter: 限制器实例
+    """
+    with _limiters_lock:
+        limiter = _limiters.get(name)
+        if limiter is None:
+            limiter = AdaptiveLimiter(
+                name,
+                initial_limit=settings.CONCURRENCY_INITIAL_LIMIT,
+                min_limit=settings.CONCURRENCY_MIN_LIMIT,
+                max_limit=settings.CONCURRENCY_MAX_LIMIT
+            )
+            _limiters[name] = limiter
+        return limiter
+
+def limiter_metrics() -> Dict[str, Dict[str, Any]]:
+    """
+    获取所有限制器的当前指标
+
+    返回:
+        Dict[str, Dict[str, Any]]: 以上游服务名称为键的指标字典
+    """
+    with _limiters_lock:
+        limiters = list(_limiters.values())
+    return {limiter.name: limiter.snapshot() for limiter in limiters}
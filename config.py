@@ -1,3 +1,4 @@
+from typing import Optional
 from pydantic_settings import BaseSettings
 from dotenv import load_dotenv
 
@@ -27,6 +28,28 @@ class Settings(BaseSettings):
     FIREWALL_API_URL: str = "http://firewall-api.example.com"
     FIREWALL_API_KEY: str
     
+    # 是否在分析结果中保留威胁情报原始响应
+    KEEP_RAW_THREAT_INTEL: bool = False
+    
+    # 上游调用自适应并发限制
+    CONCURRENCY_INITIAL_LIMIT: int = 4
+    CONCURRENCY_MIN_LIMIT: int = 1
+    CONCURRENCY_MAX_LIMIT: int = 32
+    
+    # 上游调用超时（秒）：威胁情报和防火墙接口、通义千问接口
+    UPSTREAM_TIMEOUT: float = 10.0
+    LLM_TIMEOUT: int = 120
+    
+    # 批量分析时的多告警合并：单次调用最多合并的告警数（1表示不合并）和最长等待时间（秒）
+    ANALYSIS_PACK_SIZE: int = 1
+    ANALYSIS_PACK_MAX_WAIT: float = 0.5
+    
+    # 近似重复告警结论复用：相似度阈值、索引容量和可选的持久化文件路径
+    SIMILARITY_REUSE: bool = False
+    SIMILARITY_THRESHOLD: float = 0.9
+    SIMILARITY_INDEX_SIZE: int = 10000
+    SIMILARITY_INDEX_PATH: Optional[str] = None
+    
     class Config:
         """配置类设置"""
         env_file = ".env"
@@ -1,15 +1,50 @@
 import json
+import threading
+from contextlib import ExitStack
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, List, Optional
 import typer
 from rich.console import Console
+from rich.table import Table
 from rich.panel import Panel
 from rich.markdown import Markdown
 from ai_analyzer import AIAnalyzer
+from config import settings
+from progress_journal import ProgressJournal, idempotency_key
+from profiler import Profiler
+from concurrency import limiter_metrics
+from result_sinks import LocalBulkServer, ResultSink, build_sink
+from alert_normalizer import detect_normalizer, get_normalizer
 
 # 创建Typer应用实例
 app = typer.Typer()
 # 创建Rich控制台实例
 console = Console()
 
+@app.callback()
+def cli(
+    ctx: typer.Context,
+    profile: bool = typer.Option(False, "--profile", help="开启性能分析，输出调用栈CPU采样和墙钟采样、上游等待和内存分配报告"),
+    profile_output: str = typer.Option("profile", help="性能分析输出文件路径前缀")
+):
+    """
+    AI安全运营助手
+    
+    参数:
+        profile: 是否开启性能分析
+        profile_output: 性能分析输出文件路径前缀
+    """
+    if not profile:
+        return
+    profiler = Profiler(profile_output)
+    profiler.start()
+    
+    def finish_profile():
+        collapsed_path, wall_path, summary_path = profiler.stop()
+        console.print(f"\n[bold blue]性能分析结果：[/bold blue]CPU折叠栈 {collapsed_path}，墙钟折叠栈 {wall_path}，摘要 {summary_path}")
+    
+    ctx.call_on_close(finish_profile)
+
 @app.command()
 def analyze(
     alert_file: str = typer.Option(..., help="告警JSON文件路径"),
@@ -32,7 +67,8 @@ def analyze(
         
         # 分析告警
         console.print("\n[bold blue]正在分析告警...[/bold blue]")
-        result = analyzer.analyze_alert(alert)
+        record = analyzer.normalize(alert)
+        result = analyzer.analyze_alert(alert, record=record)
         
         # 显示分析结果
         console.print("\n[bold green]分析结果：[/bold green]")
@@ -45,8 +81,10 @@ def analyze(
         console.print(f"决策原因: {decision['reason']}")
         
         # 根据决策执行响应动作
-        source_ip = alert["event"]["source"]["ip"]
-        if force_execute or decision["should_respond"]:
+        source_ip = record.source_ip
+        if not source_ip:
+            console.print("\n[bold red]告警中缺少源IP，无法执行响应动作[/bold red]")
+        elif force_execute or decision["should_respond"]:
             console.print(f"\n[bold red]正在执行响应动作：封锁IP {source_ip}[/bold red]")
             response = analyzer.execute_response(source_ip)
             console.print(json.dumps(response, indent=2, ensure_ascii=False))
@@ -56,6 +94,251 @@ def analyze(
     except Exception as e:
         console.print(f"[bold red]错误：{str(e)}[/bold red]")
 
+def _load_alerts(alert_file: str) -> List[Dict[str, Any]]:
+    """
+    读取批量告警文件
+    
+    支持JSON数组、单个JSON对象以及每行一个JSON对象（NDJSON）三种格式
+    
+    参数:
+        alert_file: 告警文件路径
+        
+    返回:
+        List[Dict[str, Any]]: 告警列表
+    """
+    with open(alert_file, 'r', encoding='utf-8') as f:
+        content = f.read()
+    try:
+        data = json.loads(content)
+        return data if isinstance(data, list) else [data]
+    except json.JSONDecodeError:
+        return [json.loads(line) for line in content.splitlines() if line.strip()]
+
+def _process_alert(
+    analyzer: AIAnalyzer,
+    journal: ProgressJournal,
+    alert: Dict[str, Any],
+    force_execute: bool,
+    sinks: List[ResultSink]
+) -> Dict[str, Any]:
+    """
+    按阶段处理单条告警，跳过进度日志中已完成的阶段
+    
+    响应阶段完成后，把分析结论写入各结果输出；恢复时响应已完成但结论未送达的告警
+    只重新输出结论
+    
+    参数:
+        analyzer: AI分析器实例
+        journal: 进度日志
+        alert: 告警信息
+        force_execute: 是否强制执行响应动作
+        sinks: 结果输出列表
+        
+    返回:
+        Dict[str, Any]: 响应阶段的处理结果
+    """
+    alert_id = ProgressJournal.digest(alert)
+    outcome = journal.get(alert_id, "responded")
+    if outcome is not None:
+        # 响应阶段总是在分析阶段之后记录
+        result = journal.get(alert_id, "analyzed")
+        if result is not None:
+            _export_result(journal, alert_id, result, outcome, sinks)
+        return outcome
+    record = analyzer.normalize(alert)
+    if not record.source_ip:
+        return {"executed": False, "ip": None, "error": "告警中缺少源IP，无法执行响应动作"}
+    
+    threat_intel = journal.get(alert_id, "enriched")
+    if threat_intel is None:
+        threat_intel = analyzer.enrich_alert(record)
+        # 查询失败（如配额耗尽、超时）的威胁情报不记录，恢复时重新查询
+        if not any(threat_intel[key].get("error") for key in ("ip_info", "vt_report")):
+            journal.record(alert_id, "enriched", threat_intel)
+    
+    result = journal.get(alert_id, "analyzed")
+    if result is None:
+        result = analyzer.analyze_alert(alert, threat_intel=threat_intel, record=record)
+        if "error" in result:
+            # 分析失败不记录，恢复时重新分析
+            return {"executed": False, "error": result["error"]}
+        journal.record(alert_id, "analyzed", result)
+    
+    source_ip = record.source_ip
+    if force_execute or result["response_decision"]["should_respond"]:
+        key = idempotency_key(alert_id, "block_ip", source_ip)
+        response = analyzer.execute_response(source_ip, idempotency_key=key)
+        if "error" in response or response.get("success") is False:
+            # 封锁失败不记录，恢复时使用相同的幂等键重试
+            return {"executed": False, "ip": source_ip, "error": f"封锁IP失败：{response.get('error', response)}"}
+        outcome = {"executed": True, "ip": source_ip, "response": response}
+    else:
+        outcome = {"executed": False, "ip": source_ip}
+    journal.record(alert_id, "responded", outcome)
+    _export_result(journal, alert_id, result, outcome, sinks)
+    return outcome
+
+def _export_result(
+    journal: ProgressJournal,
+    alert_id: str,
+    result: Dict[str, Any],
+    outcome: Dict[str, Any],
+    sinks: List[ResultSink]
+) -> None:
+    """
+    把分析结论写入各结果输出，全部送达后在进度日志中记录exported阶段
+    
+    参数:
+        journal: 进度日志
+        alert_id: 告警摘要
+        result: 分析结果
+        outcome: 响应阶段的处理结果
+        sinks: 结果输出列表
+    """
+    if not sinks or journal.is_done(alert_id, "exported"):
+        return
+    verdict = {
+        "alert_id": alert_id,
+        "source_ip": outcome["ip"],
+        "analysis": result["analysis"],
+        "response_decision": result["response_decision"],
+        "reused_from": result.get("reused_from"),
+        "threat_intel": result["threat_intel"],
+        "executed": outcome["executed"],
+        "response": outcome.get("response")
+    }
+    remaining = [len(sinks)]
+    lock = threading.Lock()
+    
+    def on_delivered():
+        with lock:
+            remaining[0] -= 1
+            done = remaining[0] == 0
+        if done:
+            journal.record(alert_id, "exported", {"sinks": len(sinks)})
+    
+    for sink in sinks:
+        sink.write(verdict, on_delivered=on_delivered)
+
+def _print_limiter_metrics():
+    """显示各上游服务自适应并发限制器的当前指标"""
+    metrics = limiter_metrics()
+    if not metrics:
+        return
+    table = Table(title="上游并发限制")
+    for column in ("上游服务", "并发上限", "进行中", "基线延迟(s)", "调用次数", "退避次数"):
+        table.add_column(column)
+    for name, snapshot in sorted(metrics.items()):
+        baseline = snapshot["baseline_latency"]
+        table.add_row(
+            name,
+            str(snapshot["limit"]),
+            str(snapshot["in_flight"]),
+            f"{baseline:.3f}" if baseline is not None else "-",
+            str(snapshot["samples"]),
+            str(snapshot["drops"])
+        )
+    console.print(table)
+
+@app.command()
+def batch(
+    alert_file: str = typer.Option(..., help="告警文件路径（JSON数组或每行一个JSON对象）"),
+    journal_file: str = typer.Option("batch_journal.jsonl", "--journal", help="进度日志文件路径"),
+    resume: bool = typer.Option(False, help="从进度日志恢复，跳过已完成的处理阶段"),
+    fresh: bool = typer.Option(False, help="清空已有的进度日志重新开始"),
+    force_execute: bool = typer.Option(False, help="强制执行响应动作，忽略AI决策"),
+    workers: Optional[int] = typer.Option(
+        None, help="同时处理的告警数上限，默认等于上游并发上限的最大值，实际上游并发由自适应限制器控制"
+    ),
+    pack_size: Optional[int] = typer.Option(None, help="单次大模型调用合并分析的最大告警数，默认读取配置"),
+    pack_max_wait: Optional[float] = typer.Option(None, help="告警等待合并分析的最长时间（秒），默认读取配置"),
+    reuse_similar: Optional[bool] = typer.Option(
+        None, "--reuse-similar/--no-reuse-similar", help="复用近似重复告警的分析结论，默认读取配置"
+    ),
+    sink: Optional[List[str]] = typer.Option(
+        None, help="结果输出，可重复指定：file:<路径>、es:<地址>/<索引>、webhook:<URL>"
+    ),
+    alert_format: Optional[str] = typer.Option(
+        None, help="告警格式（wazuh、suricata_eve、elastic_ecs、generic），默认根据第一条告警自动检测"
+    )
+):
+    """
+    批量分析安全告警
+    
+    每条告警的处理进度都会写入进度日志，任务中断后可使用--resume继续，
+    已完成的威胁情报查询、AI分析和响应动作不会重复执行，未送达结果输出的结论会重新输出
+    
+    参数:
+        alert_file: 告警文件路径
+        journal_file: 进度日志文件路径
+        resume: 是否从进度日志恢复
+        fresh: 是否清空已有的进度日志重新开始
+        force_execute: 是否强制执行响应动作，忽略AI决策
+        workers: 同时处理的告警数上限，默认为CONCURRENCY_MAX_LIMIT
+        pack_size: 单次大模型调用合并分析的最大告警数
+        pack_max_wait: 告警等待合并分析的最长时间（秒）
+        reuse_similar: 是否复用近似重复告警的分析结论
+        sink: 结果输出描述列表
+        alert_format: 告警格式名称
+    """
+    try:
+        alerts = _load_alerts(alert_file)
+        if alert_format is not None:
+            get_normalizer(alert_format)
+        elif alerts:
+            # 同一文件中的告警来自同一来源，只检测一次格式
+            alert_format = detect_normalizer(alerts[0]).name
+        analyzer = AIAnalyzer(
+            pack_size=pack_size if pack_size is not None else settings.ANALYSIS_PACK_SIZE,
+            pack_max_wait=pack_max_wait,
+            reuse_similar=reuse_similar,
+            alert_format=alert_format
+        )
+        
+        console.print(f"\n[bold blue]正在批量分析 {len(alerts)} 条告警...[/bold blue]")
+        skipped = executed = failed = 0
+        with ExitStack() as stack:
+            # 结果输出在进度日志之前关闭，关闭时送达的结论仍能记录exported阶段
+            journal = stack.enter_context(ProgressJournal(journal_file, resume=resume, overwrite=fresh))
+            sinks = [stack.enter_context(build_sink(spec)) for spec in sink or []]
+            done_stage = "exported" if sinks else "responded"
+            executor = stack.enter_context(ThreadPoolExecutor(max_workers=max(1, workers or settings.CONCURRENCY_MAX_LIMIT)))
+            futures = {}
+            for index, alert in enumerate(alerts, 1):
+                if journal.is_done(ProgressJournal.digest(alert), done_stage):
+                    skipped += 1
+                    continue
+                future = executor.submit(_process_alert, analyzer, journal, alert, force_execute, sinks)
+                futures[future] = index
+            
+            for future in as_completed(futures):
+                index = futures[future]
+                try:
+                    outcome = future.result()
+                except Exception as e:
+                    outcome = {"executed": False, "error": str(e)}
+                if "error" in outcome:
+                    failed += 1
+                    console.print(f"[{index}] [bold red]处理失败：{outcome['error']}[/bold red]")
+                elif outcome["executed"]:
+                    executed += 1
+                    console.print(f"[{index}] [bold red]已封锁IP {outcome['ip']}[/bold red]")
+                else:
+                    console.print(f"[{index}] [yellow]IP {outcome['ip']} 无需响应[/yellow]")
+        
+        console.print(
+            f"\n[bold green]批量分析完成：[/bold green]共 {len(alerts)} 条，"
+            f"跳过已完成 {skipped} 条，执行响应 {executed} 条，失败 {failed} 条"
+        )
+        dropped = sum(s.dropped for s in sinks)
+        if dropped:
+            console.print(f"[bold red]结果输出丢弃 {dropped} 条记录[/bold red]")
+        if analyzer.similarity_index is not None:
+            analyzer.similarity_index.save()
+        _print_limiter_metrics()
+    except Exception as e:
+        console.print(f"[bold red]错误：{str(e)}[/bold red]")
+
 @app.command()
 def list_blocked():
     """
@@ -68,5 +351,26 @@ def list_blocked():
     console.print("\n[bold blue]当前被封锁的IP地址：[/bold blue]")
     console.print(json.dumps(blocked_ips, indent=2, ensure_ascii=False))
 
+@app.command()
+def serve_sink(
+    host: str = typer.Option("127.0.0.1", help="监听地址"),
+    port: int = typer.Option(9200, help="监听端口")
+):
+    """
+    启动本地结果输出替身服务器
+    
+    接受Elasticsearch _bulk请求和Webhook请求，用于在没有SIEM的环境中测试结果输出
+    
+    参数:
+        host: 监听地址
+        port: 监听端口
+    """
+    server = LocalBulkServer(host, port)
+    console.print(f"\n[bold blue]替身服务器已启动：{server.url}[/bold blue]")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        console.print(f"\n共收到 {server.requests} 个请求，{len(server.documents)} 条记录")
+
 if __name__ == "__main__":
     app() 
\ No newline at end of file
@@ -0,0 +1,176 @@
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from types import FrameType
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# 当前正在运行的性能分析器，未开启性能分析时为None
+_active: Optional["Profiler"] = None
+
+# 空闲等待的栈顶帧（文件名, 函数名），处于这些位置的线程不计入采样
+_IDLE_FRAMES = frozenset({
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("queue.py", "get"),
+    ("selectors.py", "select"),
+    ("socketserver.py", "serve_forever"),
+    ("thread.py", "_worker"),
+})
+
+# 栈顶帧位于这些文件中的线程正阻塞在网络I/O上（如socket.readinto、ssl.recv_into），
+# 只计入墙钟采样，不计入CPU采样；等待时间已由upstream_timer按上游服务统计
+_IO_WAIT_FILES = frozenset({"socket.py", "ssl.py", "selectors.py"})
+
+@contextmanager
+def upstream_timer(name: str) -> Iterator[None]:
+    """
+    统计对上游服务调用的等待时间
+
+    未开启性能分析时不做任何记录。
+
+    参数:
+        name: 上游服务名称，如dashscope、virustotal
+    """
+    profiler = _active
+    if profiler is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profiler.record_wait(name, time.perf_counter() - start)
+
+class Profiler:
+    """
+    命令行性能分析器
+
+    在命令执行期间采集以下信息：
+    - CPU采样：定时采集正在执行Python代码的线程的调用栈，输出为火焰图可用的折叠栈（collapsed stack）格式；
+      等待锁、队列、线程池任务的空闲线程以及阻塞在网络I/O上的线程不计入
+    - 墙钟采样：额外计入阻塞在网络I/O上的线程，单独输出一份折叠栈
+    - 上游等待：按上游服务统计调用次数和耗时
+    - 内存分配：使用tracemalloc统计分配最多的代码位置
+
+    属性:
+        output_prefix: 输出文件路径前缀
+        interval: 采样间隔（秒）
+        top: 摘要中每类信息显示的条目数
+    """
+
+    def __init__(self, output_prefix: str = "profile", interval: float = 0.005, top: int = 15):
+        """
+        初始化性能分析器
+
+        参数:
+            output_prefix: 输出文件路径前缀
+            interval: 采样间隔（秒）
+            top: 摘要中每类信息显示的条目数
+        """
+        self.output_prefix = output_prefix
+        self.interval = interval
+        self.top = top
+        self._stacks: Counter = Counter()
+        self._wall_stacks: Counter = Counter()
+        self._waits: Dict[str, List[float]] = defaultdict(list)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._started_at = 0.0
+
+    def record_wait(self, name: str, seconds: float) -> None:
+        """记录一次上游调用的等待时间"""
+        with self._lock:
+            self._waits[name].append(seconds)
+
+    def start(self) -> None:
+        """开始采集"""
+        global _active
+        _active = self
+        self._started_at = time.perf_counter()
+        tracemalloc.start(10)
+        self._thread = threading.Thread(target=self._sample_loop, name="profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> Tuple[str, str, str]:
+        """
+        停止采集并写入结果文件
+
+        返回:
+            Tuple[str, str, str]: (CPU折叠栈文件路径, 墙钟折叠栈文件路径, 摘要文件路径)
+        """
+        global _active
+        _active = None
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        elapsed = time.perf_counter() - self._started_at
+        snapshot = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+
+        collapsed_path = f"{self.output_prefix}.collapsed"
+        wall_path = f"{self.output_prefix}.wall.collapsed"
+        summary_path = f"{self.output_prefix}.txt"
+        for path, stacks in ((collapsed_path, self._stacks), (wall_path, self._wall_stacks)):
+            with open(path, "w", encoding="utf-8") as f:
+                for stack, count in stacks.most_common():
+                    f.write(f"{stack} {count}\n")
+        with open(summary_path, "w", encoding="utf-8") as f:
+            f.write(self._summary(elapsed, snapshot))
+        return collapsed_path, wall_path, summary_path
+
+    def _sample_loop(self) -> None:
+        """定时采集除采样线程和空闲线程外所有线程的调用栈"""
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, leaf in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                leaf_file = os.path.basename(leaf.f_code.co_filename)
+                if (leaf_file, leaf.f_code.co_name) in _IDLE_FRAMES:
+                    continue
+                stack = []
+                frame: Optional[FrameType] = leaf
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                collapsed = ";".join(reversed(stack))
+                self._wall_stacks[collapsed] += 1
+                if leaf_file not in _IO_WAIT_FILES:
+                    self._stacks[collapsed] += 1
+
+    def _summary(self, elapsed: float, snapshot: tracemalloc.Snapshot) -> str:
+        """生成文本摘要"""
+        lines = [
+            f"总耗时: {elapsed:.3f}s",
+            f"CPU采样数（不含空闲线程和网络I/O等待）: {sum(self._stacks.values())}",
+            f"墙钟采样数（不含空闲线程）: {sum(self._wall_stacks.values())}",
+            ""
+        ]
+
+        lines.append("采样最多的函数（自身，CPU）：")
+        leaf_counts: Counter = Counter()
+        for stack, count in self._stacks.items():
+            leaf_counts[stack.rsplit(";", 1)[-1]] += count
+        for frame, count in leaf_counts.most_common(self.top):
+            lines.append(f"  {count:>8}  {frame}")
+        lines.append("")
+
+        lines.append("上游等待时间：")
+        for name, waits in sorted(self._waits.items(), key=lambda item: -sum(item[1])):
+            lines.append(
+                f"  {name:<12} 调用 {len(waits):>5} 次  合计 {sum(waits):.3f}s  "
+                f"平均 {sum(waits) / len(waits):.3f}s  最大 {max(waits):.3f}s"
+            )
+        lines.append("")
+
+        lines.append("内存分配最多的位置：")
+        for stat in snapshot.statistics("lineno")[:self.top]:
+            frame = stat.traceback[0]
+            lines.append(f"  {stat.size / 1024:>10.1f} KiB  {stat.count:>7} 块  {frame.filename}:{frame.lineno}")
+        return "\n".join(lines) + "\n"
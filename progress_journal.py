@@ -0,0 +1,140 @@
+import hashlib
+import json
+import os
+import threading
+from typing import Any, Dict, Optional
+
+class ProgressJournal:
+    """
+    批量处理进度日志类
+
+    以追加写（write-ahead）的方式把每条告警各处理阶段的完成情况写入JSONL文件，
+    用于在批量任务中断后恢复处理：
+    - enriched: 威胁情报查询完成
+    - analyzed: AI分析完成
+    - responded: 响应动作处理完成
+    - exported: 分析结论已送达所有结果输出
+
+    每条记录都带有内容摘要，恢复时会丢弃摘要不匹配或写入不完整的记录。
+
+    属性:
+        path: 日志文件路径
+    """
+
+    STAGES = ("enriched", "analyzed", "responded", "exported")
+
+    def __init__(self, path: str, resume: bool = False, overwrite: bool = False):
+        """
+        初始化进度日志
+
+        参数:
+            path: 日志文件路径
+            resume: 是否从已有日志恢复
+            overwrite: 不恢复时是否清空已有的日志；为否且日志非空时抛出FileExistsError，
+                避免崩溃后直接重跑命令丢失已记录的进度
+        """
+        if not resume and not overwrite and os.path.exists(path) and os.path.getsize(path) > 0:
+            raise FileExistsError(f"进度日志 {path} 已存在，请使用--resume继续处理或--fresh重新开始")
+        self.path = path
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        if resume and os.path.exists(path):
+            self._replay()
+        self._file = open(path, "a" if resume else "w", encoding="utf-8")
+
+    @staticmethod
+    def digest(data: Any) -> str:
+        """
+        计算数据的内容摘要
+
+        参数:
+            data: 可JSON序列化的数据
+
+        返回:
+            str: SHA-256十六进制摘要
+        """
+        payload = json.dumps(data, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _replay(self) -> None:
+        """读取已有日志，重建各告警的阶段完成状态"""
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # 崩溃时最后一行可能只写了一半
+                    continue
+                if not isinstance(entry, dict) or entry.get("stage") not in self.STAGES:
+                    continue
+                if entry.get("digest") != self.digest(entry.get("data")):
+                    continue
+                self._entries.setdefault(entry["alert_id"], {})[entry["stage"]] = entry["data"]
+
+    def get(self, alert_id: str, stage: str) -> Optional[Any]:
+        """
+        获取某条告警某个阶段的已记录结果
+
+        参数:
+            alert_id: 告警摘要
+            stage: 处理阶段
+
+        返回:
+            Optional[Any]: 已记录的阶段结果，未完成时返回None
+        """
+        return self._entries.get(alert_id, {}).get(stage)
+
+    def is_done(self, alert_id: str, stage: str) -> bool:
+        """判断某条告警的某个阶段是否已完成"""
+        return stage in self._entries.get(alert_id, {})
+
+    def record(self, alert_id: str, stage: str, data: Any) -> None:
+        """
+        记录阶段完成，写入后立即落盘
+
+        参数:
+            alert_id: 告警摘要
+            stage: 处理阶段
+            data: 阶段结果（需可JSON序列化）
+        """
+        if stage not in self.STAGES:
+            raise ValueError(f"未知的处理阶段: {stage}")
+        entry = {
+            "alert_id": alert_id,
+            "stage": stage,
+            "digest": self.digest(data),
+            "data": data
+        }
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._entries.setdefault(alert_id, {})[stage] = data
+
+    def close(self) -> None:
+        """关闭日志文件"""
+        self._file.close()
+
+    def __enter__(self) -> "ProgressJournal":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+def idempotency_key(alert_id: str, action: str, target: str) -> str:
+    """
+    生成响应动作的幂等键
+
+    同一告警对同一目标执行同一动作时总是得到相同的键，
+    恢复执行时防火墙可据此忽略重复请求。
+
+    参数:
+        alert_id: 告警摘要
+        action: 动作名称，如block_ip
+        target: 动作目标，如IP地址
+
+    返回:
+        str: 幂等键
+    """
+    return hashlib.sha256(f"{alert_id}:{action}:{target}".encode("utf-8")).hexdigest()[:32]
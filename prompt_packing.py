@@ -0,0 +1,118 @@
+import logging
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 单条告警的分析结果：(分析报告, 是否执行响应动作, 决策原因)，无法提取决策时是否执行响应动作为None
+Decision = Tuple[str, Optional[bool], str]
+
+# 写入Future表示该告警需要由提交它的线程自行单条分析
+_FALLBACK = object()
+
+class _PendingAlert:
+    """等待合并分析的告警"""
+
+    __slots__ = ("alert", "threat_intel", "future")
+
+    def __init__(self, alert: str, threat_intel: str):
+        self.alert = alert
+        self.threat_intel = threat_intel
+        self.future: Future = Future()
+
+class PromptPacker:
+    """
+    告警合并分析器
+
+    把多个线程并发提交的告警合并为一次大模型调用，以分摊提示指令和往返延迟：
+    - 待分析告警达到max_size条时立即发送
+    - 最早提交的告警等待超过max_wait秒时，把当前已积累的告警一起发送
+    - 合并结果解析失败或缺少某条告警时，对相应告警退回单条分析，
+      单条分析由提交各告警的线程分别执行，彼此并行
+
+    属性:
+        max_size: 单次调用合并的最大告警数
+        max_wait: 告警等待合并的最长时间（秒）
+    """
+
+    def __init__(
+        self,
+        analyze_packed: Callable[[List[Tuple[str, str, str]]], Dict[str, Decision]],
+        analyze_single: Callable[[str, str], Decision],
+        max_size: int,
+        max_wait: float
+    ):
+        """
+        初始化合并分析器
+
+        参数:
+            analyze_packed: 合并分析函数，输入(告警ID, 告警, 威胁情报)列表，返回以告警ID为键的结果
+            analyze_single: 单条分析函数，输入(告警, 威胁情报)
+            max_size: 单次调用合并的最大告警数
+            max_wait: 告警等待合并的最长时间（秒）
+        """
+        self.analyze_packed = analyze_packed
+        self.analyze_single = analyze_single
+        self.max_size = max_size
+        self.max_wait = max_wait
+        self._pending: List[_PendingAlert] = []
+        self._lock = threading.Lock()
+
+    def analyze(self, alert: str, threat_intel: str) -> Decision:
+        """
+        提交一条告警并等待其分析结果
+
+        参数:
+            alert: 格式化后的告警信息
+            threat_intel: 格式化后的威胁情报信息
+
+        返回:
+            Decision: (分析报告, 是否执行响应动作, 决策原因)
+        """
+        item = _PendingAlert(alert, threat_intel)
+        with self._lock:
+            self._pending.append(item)
+            batch = self._take() if len(self._pending) >= self.max_size else None
+        if batch:
+            self._dispatch(batch)
+        try:
+            result = item.future.result(timeout=self.max_wait)
+        except FutureTimeoutError:
+            # 等待超时，由当前线程把已积累的告警发送出去
+            with self._lock:
+                batch = self._take() if item in self._pending else None
+            if batch:
+                self._dispatch(batch)
+            result = item.future.result()
+        if result is _FALLBACK:
+            return self.analyze_single(alert, threat_intel)
+        return result
+
+    def _take(self) -> List[_PendingAlert]:
+        """取出当前所有待分析告警（调用方需持有锁）"""
+        batch, self._pending = self._pending, []
+        return batch
+
+    def _dispatch(self, batch: List[_PendingAlert]) -> None:
+        """合并分析一批告警，把结果写回各自的Future，需要单条分析的告警写入_FALLBACK"""
+        remaining = batch
+        if len(batch) > 1:
+            ids = [f"alert-{index}" for index in range(1, len(batch) + 1)]
+            try:
+                results = self.analyze_packed(
+                    [(alert_id, item.alert, item.threat_intel) for alert_id, item in zip(ids, batch)]
+                )
+                remaining = []
+                for alert_id, item in zip(ids, batch):
+                    if alert_id in results:
+                        item.future.set_result(results[alert_id])
+                    else:
+                        remaining.append(item)
+                if remaining:
+                    logger.warning(f"合并分析结果缺少 {len(remaining)} 条告警，退回单条分析")
+            except Exception as e:
+                logger.warning(f"合并分析失败，退回单条分析: {str(e)}")
+                remaining = batch
+        for item in remaining:
+            item.future.set_result(_FALLBACK)
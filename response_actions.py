@@ -1,6 +1,7 @@
 import requests
-from typing import Dict, List
+from typing import Dict, List, Optional
 from config import settings
+from profiler import upstream_timer
 
 class ResponseActions:
     """
@@ -19,26 +20,31 @@ class ResponseActions:
         """初始化响应动作服务，设置防火墙API地址"""
         self.firewall_api_url = settings.FIREWALL_API_URL
     
-    def block_ip(self, ip: str, duration: int = 3600) -> Dict:
+    def block_ip(self, ip: str, duration: int = 3600, idempotency_key: Optional[str] = None) -> Dict:
         """
         在防火墙上封锁IP地址
         
         参数:
             ip: 要封锁的IP地址
             duration: 封锁持续时间（秒），默认1小时
+            idempotency_key: 幂等键，重复提交相同的键时防火墙不会重复封锁
             
         返回:
             Dict: 包含封锁操作结果的字典
         """
         try:
-            response = requests.post(
-                f"{self.firewall_api_url}/block",
-                json={
-                    "ip": ip,
-                    "duration": duration,
-                    "reason": "Suspicious activity detected"
-                }
-            )
+            headers = {"Idempotency-Key": idempotency_key} if idempotency_key else None
+            with upstream_timer("firewall"):
+                response = requests.post(
+                    f"{self.firewall_api_url}/block",
+                    json={
+                        "ip": ip,
+                        "duration": duration,
+                        "reason": "Suspicious activity detected"
+                    },
+                    headers=headers,
+                    timeout=settings.UPSTREAM_TIMEOUT
+                )
             return response.json()
         except Exception as e:
             return {"error": str(e)}
@@ -54,10 +60,12 @@ class ResponseActions:
             Dict: 包含解除封锁操作结果的字典
         """
         try:
-            response = requests.post(
-                f"{self.firewall_api_url}/unblock",
-                json={"ip": ip}
-            )
+            with upstream_timer("firewall"):
+                response = requests.post(
+                    f"{self.firewall_api_url}/unblock",
+                    json={"ip": ip},
+                    timeout=settings.UPSTREAM_TIMEOUT
+                )
             return response.json()
         except Exception as e:
             return {"error": str(e)}
@@ -70,7 +78,8 @@ class ResponseActions:
             List[Dict]: 包含所有被封锁IP信息的列表
         """
         try:
-            response = requests.get(f"{self.firewall_api_url}/blocked")
+            with upstream_timer("firewall"):
+                response = requests.get(f"{self.firewall_api_url}/blocked", timeout=settings.UPSTREAM_TIMEOUT)
             return response.json()
         except Exception as e:
             return [{"error": str(e)}] 
\ No newline at end of file
@@ -0,0 +1,422 @@
+import gzip
+import json
+import logging
+import queue
+import threading
+import time
+from abc import ABC, abstractmethod
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import requests
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# 可以重试的HTTP状态码，其余4xx表示请求本身有问题，重试也不会成功
+RETRYABLE_STATUS_CODES = (408, 429, 500, 502, 503, 504)
+
+_CLOSE = object()
+
+# 队列中的一条待发送记录：(结果记录, 送达后的回调)
+_Entry = Tuple[Dict[str, Any], Optional[Callable[[], None]]]
+
+class ResultSink(ABC):
+    """
+    异步结果输出基类
+
+    分析结果写入有界队列后立即返回，由后台线程按数量或时间批量发送：
+    - 队列已满时write会阻塞，对上游形成背压
+    - 发送失败时按指数退避重试，重试耗尽后丢弃并记录日志
+    - 记录送达后在后台线程中调用写入时传入的回调，丢弃的记录不会回调
+
+    子类只需实现_send，返回需要重试的记录，无法重试的记录调用_reject丢弃。
+
+    属性:
+        batch_size: 单批最多记录数
+        flush_interval: 最长发送间隔（秒）
+        max_retries: 最大重试次数
+        dropped: 重试耗尽后丢弃的记录数
+    """
+
+    def __init__(
+        self,
+        batch_size: int = 500,
+        flush_interval: float = 1.0,
+        queue_size: int = 10000,
+        max_retries: int = 3,
+        retry_backoff: float = 0.5
+    ):
+        """
+        初始化结果输出并启动后台线程
+
+        参数:
+            batch_size: 单批最多记录数
+            flush_interval: 最长发送间隔（秒）
+            queue_size: 队列容量
+            max_retries: 最大重试次数
+            retry_backoff: 首次重试等待时间（秒），之后每次翻倍
+        """
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.dropped = 0
+        self._rejected: set = set()
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._thread = threading.Thread(target=self._run, name=type(self).__name__, daemon=True)
+        self._thread.start()
+
+    def write(self, record: Dict[str, Any], on_delivered: Optional[Callable[[], None]] = None) -> None:
+        """
+        写入一条结果，队列已满时阻塞等待
+
+        参数:
+            record: 可JSON序列化的结果记录
+            on_delivered: 记录送达后的回调
+        """
+        self._queue.put((record, on_delivered))
+
+    def close(self) -> None:
+        """发送剩余记录并停止后台线程"""
+        self._queue.put(_CLOSE)
+        self._thread.join()
+
+    def __enter__(self) -> "ResultSink":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _run(self) -> None:
+        """后台线程：按数量或时间攒批发送"""
+        batch: List[_Entry] = []
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            try:
+                item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                item = None
+            if item is _CLOSE:
+                if batch:
+                    self._flush(batch)
+                self._on_close()
+                return
+            if item is not None:
+                batch.append(item)
+            if len(batch) >= self.batch_size or time.monotonic() >= deadline:
+                if batch:
+                    self._flush(batch)
+                    batch = []
+                deadline = time.monotonic() + self.flush_interval
+
+    def _flush(self, batch: List[_Entry]) -> None:
+        """发送一批记录，失败时按指数退避重试，并回调已送达的记录"""
+        pending = batch
+        for attempt in range(self.max_retries + 1):
+            self._rejected.clear()
+            try:
+                retry = {id(record) for record in self._send([record for record, _ in pending])}
+            except Exception as e:
+                logger.warning(f"{type(self).__name__} 发送失败: {str(e)}")
+            else:
+                remaining = []
+                for entry in pending:
+                    record, on_delivered = entry
+                    if id(record) in retry:
+                        remaining.append(entry)
+                    elif id(record) not in self._rejected and on_delivered is not None:
+                        try:
+                            on_delivered()
+                        except Exception as e:
+                            logger.error(f"{type(self).__name__} 送达回调出错: {str(e)}")
+                pending = remaining
+            if not pending:
+                return
+            if attempt < self.max_retries:
+                time.sleep(self.retry_backoff * (2 ** attempt))
+        self.dropped += len(pending)
+        logger.error(f"{type(self).__name__} 重试耗尽，丢弃 {len(pending)} 条结果")
+
+    def _reject(self, record: Dict[str, Any], reason: Any) -> None:
+        """丢弃一条无法重试的记录（仅在_send中调用）"""
+        self.dropped += 1
+        self._rejected.add(id(record))
+        logger.error(f"{type(self).__name__} 拒绝写入记录: {reason}")
+
+    @abstractmethod
+    def _send(self, batch: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        发送一批记录
+
+        参数:
+            batch: 待发送记录
+
+        返回:
+            List[Dict[str, Any]]: 需要重试的记录，全部成功时为空列表
+        """
+
+    def _on_close(self) -> None:
+        """后台线程退出前的清理"""
+
+class FileSink(ResultSink):
+    """
+    NDJSON文件输出，路径以.gz结尾时使用gzip压缩
+
+    属性:
+        path: 输出文件路径
+    """
+
+    def __init__(self, path: str, **kwargs):
+        """
+        初始化文件输出
+
+        参数:
+            path: 输出文件路径
+        """
+        self.path = path
+        if path.endswith(".gz"):
+            self._file = gzip.open(path, "at", encoding="utf-8")
+        else:
+            self._file = open(path, "a", encoding="utf-8")
+        super().__init__(**kwargs)
+
+    def _send(self, batch: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        self._file.write("".join(json.dumps(record, ensure_ascii=False) + "\n" for record in batch))
+        self._file.flush()
+        return []
+
+    def _on_close(self) -> None:
+        self._file.close()
+
+class ElasticsearchBulkSink(ResultSink):
+    """
+    Elasticsearch _bulk接口输出
+
+    每批记录以一次_bulk请求写入，文档ID为告警摘要，重复写入会覆盖而不是新增。
+    只重试被限流（429）的文档，其他文档级错误以及请求本身被拒绝（如400、413）时
+    记录日志后丢弃。
+
+    属性:
+        url: Elasticsearch地址
+        index: 写入的索引名
+        timeout: 请求超时（秒）
+    """
+
+    def __init__(
+        self,
+        url: str,
+        index: str,
+        headers: Optional[Dict[str, str]] = None,
+        timeout: Optional[float] = None,
+        **kwargs
+    ):
+        """
+        初始化Elasticsearch输出
+
+        参数:
+            url: Elasticsearch地址，如http://localhost:9200
+            index: 写入的索引名
+            headers: 额外的请求头，如认证信息
+            timeout: 请求超时（秒），默认读取UPSTREAM_TIMEOUT配置
+        """
+        self.url = url.rstrip("/")
+        self.index = index
+        self.headers = {"Content-Type": "application/x-ndjson", **(headers or {})}
+        self.timeout = timeout if timeout is not None else settings.UPSTREAM_TIMEOUT
+        super().__init__(**kwargs)
+
+    def _send(self, batch: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        body = "".join(
+            json.dumps({"index": {"_index": self.index, "_id": record["alert_id"]}}) + "\n"
+            + json.dumps(record, ensure_ascii=False) + "\n"
+            for record in batch
+        )
+        response = requests.post(
+            f"{self.url}/_bulk",
+            data=body.encode("utf-8"),
+            headers=self.headers,
+            timeout=self.timeout
+        )
+        if response.status_code in RETRYABLE_STATUS_CODES:
+            return batch
+        if 400 <= response.status_code < 500:
+            for record in batch:
+                self._reject(record, f"HTTP {response.status_code}")
+            return []
+        response.raise_for_status()
+        result = response.json()
+        if not result.get("errors"):
+            return []
+        retry = []
+        for record, item in zip(batch, result.get("items", [])):
+            details: Dict[str, Any] = next(iter(item.values()), {})
+            status = details.get("status", 200)
+            if status == 429:
+                retry.append(record)
+            elif status >= 300:
+                self._reject(record, item)
+        return retry
+
+class WebhookSink(ResultSink):
+    """
+    Webhook输出，每批记录以JSON数组POST到指定地址
+
+    请求被拒绝（408、429以外的4xx）时不重试，整批记录日志后丢弃。
+
+    属性:
+        url: Webhook地址
+        timeout: 请求超时（秒）
+    """
+
+    def __init__(
+        self,
+        url: str,
+        headers: Optional[Dict[str, str]] = None,
+        timeout: Optional[float] = None,
+        **kwargs
+    ):
+        """
+        初始化Webhook输出
+
+        参数:
+            url: Webhook地址
+            headers: 额外的请求头
+            timeout: 请求超时（秒），默认读取UPSTREAM_TIMEOUT配置
+        """
+        self.url = url
+        self.headers = headers
+        self.timeout = timeout if timeout is not None else settings.UPSTREAM_TIMEOUT
+        super().__init__(**kwargs)
+
+    def _send(self, batch: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        response = requests.post(self.url, json=batch, headers=self.headers, timeout=self.timeout)
+        if response.status_code in RETRYABLE_STATUS_CODES:
+            return batch
+        if 400 <= response.status_code < 500:
+            for record in batch:
+                self._reject(record, f"HTTP {response.status_code}")
+            return []
+        response.raise_for_status()
+        return []
+
+def build_sink(spec: str) -> ResultSink:
+    """
+    根据描述创建结果输出
+
+    参数:
+        spec: 输出描述，支持以下格式：
+            file:<路径>（.gz结尾时压缩）
+            es:<Elasticsearch地址>/<索引名>
+            webhook:<URL>
+
+    返回:
+        ResultSink: 结果输出实例
+    """
+    kind, _, target = spec.partition(":")
+    if kind == "file" and target:
+        return FileSink(target)
+    if kind == "es" and "/" in target.split("://", 1)[-1]:
+        url, _, index = target.rstrip("/").rpartition("/")
+        return ElasticsearchBulkSink(url, index)
+    if kind == "webhook" and target:
+        return WebhookSink(target)
+    raise ValueError(f"无法识别的结果输出: {spec}")
+
+class LocalBulkServer:
+    """
+    本地替身服务器，用于在没有SIEM的环境中测试结果输出
+
+    接受Elasticsearch _bulk请求和任意路径的Webhook请求，并保存收到的文档。
+
+    属性:
+        documents: 收到的文档列表
+        requests: 收到的请求数
+        fail_next: 接下来需要返回503的请求数，用于测试重试
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        """
+        初始化替身服务器
+
+        参数:
+            host: 监听地址
+            port: 监听端口，为0时自动分配
+        """
+        self.documents: List[Any] = []
+        self.requests = 0
+        self.fail_next = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def address(self) -> Tuple[str, int]:
+        """监听的地址和端口"""
+        host, port = self._server.server_address[:2]
+        return str(host), int(port)
+
+    @property
+    def url(self) -> str:
+        """服务器基础URL"""
+        host, port = self.address
+        return f"http://{host}:{port}"
+
+    def _handler(self):
+        """创建绑定到当前服务器实例的请求处理类"""
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                with server._lock:
+                    server.requests += 1
+                    if server.fail_next > 0:
+                        server.fail_next -= 1
+                        self._reply(503, {"error": "unavailable"})
+                        return
+                    if self.path.endswith("/_bulk"):
+                        lines = [json.loads(line) for line in body.decode("utf-8").splitlines() if line.strip()]
+                        docs = lines[1::2]
+                        server.documents.extend(docs)
+                        payload = {
+                            "took": 0,
+                            "errors": False,
+                            "items": [{"index": {"status": 201}} for _ in docs]
+                        }
+                    else:
+                        data = json.loads(body or b"null")
+                        server.documents.extend(data if isinstance(data, list) else [data])
+                        payload = {"received": len(data) if isinstance(data, list) else 1}
+                self._reply(200, payload)
+
+            def _reply(self, status, payload):
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                logger.debug(format % args)
+
+        return Handler
+
+    def start(self) -> "LocalBulkServer":
+        """在后台线程中启动服务器"""
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def serve_forever(self) -> None:
+        """在当前线程中运行服务器"""
+        self._server.serve_forever()
+
+    def stop(self) -> None:
+        """停止服务器"""
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
@@ -0,0 +1,222 @@
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from alert_normalizer import NormalizedAlert
+
+# MinHash使用的梅森素数模数
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+# 只保留由字母组成的词，端口、进程号、IP、时间等数字在相似度比较中没有意义
+_TOKEN_PATTERN = re.compile(r"[^\W\d]+")
+
+def _bucket_count(value: int) -> str:
+    """把检出数量分档，避免数量的小幅变化影响相似度"""
+    if value <= 0:
+        return "0"
+    if value <= 5:
+        return "1-5"
+    return ">5"
+
+def alert_features(alert: NormalizedAlert, threat_intel: Dict[str, Any]) -> Set[str]:
+    """
+    提取用于近似去重的告警特征
+
+    特征包括规则、目标服务、归一化后的日志词组以及分档后的威胁情报，
+    源端口、时间戳、事件ID等每条告警都不同的字段不参与比较。
+
+    参数:
+        alert: 归一化后的告警记录
+        threat_intel: 精简后的威胁情报记录
+
+    返回:
+        Set[str]: 特征集合
+    """
+    log_text = str(alert.raw_log or alert.description or "")
+
+    features = {
+        f"rule:{alert.rule_id or alert.rule_name or alert.alert_type or ''}",
+        f"service:{alert.target_service or alert.target_port or ''}",
+    }
+    tokens = _TOKEN_PATTERN.findall(log_text.lower())
+    features.update(f"tok:{token}" for token in tokens)
+    features.update(f"bi:{a} {b}" for a, b in zip(tokens, tokens[1:]))
+
+    ip_info = threat_intel.get("ip_info", {})
+    vt_report = threat_intel.get("vt_report", {})
+    features.add(f"country:{ip_info.get('country') or ''}")
+    features.add(f"malicious:{_bucket_count(vt_report.get('malicious', 0))}")
+    features.add(f"suspicious:{_bucket_count(vt_report.get('suspicious', 0))}")
+    return features
+
+class SimilarityIndex:
+    """
+    告警相似度索引
+
+    使用MinHash签名估计告警特征集合的Jaccard相似度，并通过LSH分段（banding）
+    快速找到候选告警，用于复用近似重复告警的分析结论。索引大小有上限，
+    超出时淘汰最久未命中的条目，可选持久化到JSON文件。
+
+    属性:
+        threshold: 复用结论所需的最小相似度
+        capacity: 索引最多保存的告警数
+        num_perm: MinHash签名长度
+        bands: LSH分段数
+        path: 持久化文件路径，为空时不持久化
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.9,
+        capacity: int = 10000,
+        num_perm: int = 64,
+        bands: int = 16,
+        path: Optional[str] = None
+    ):
+        """
+        初始化相似度索引
+
+        参数:
+            threshold: 复用结论所需的最小相似度
+            capacity: 索引最多保存的告警数
+            num_perm: MinHash签名长度，需能被bands整除
+            bands: LSH分段数
+            path: 持久化文件路径，文件存在时会加载其中的条目
+        """
+        if num_perm % bands:
+            raise ValueError("num_perm必须能被bands整除")
+        self.threshold = threshold
+        self.capacity = capacity
+        self.num_perm = num_perm
+        self.bands = bands
+        self.path = path
+        self._rows = num_perm // bands
+        rng = random.Random(1)
+        self._permutations = [
+            (rng.randrange(1, _MERSENNE_PRIME), rng.randrange(0, _MERSENNE_PRIME))
+            for _ in range(num_perm)
+        ]
+        self._entries: "OrderedDict[str, Tuple[Tuple[int, ...], Dict[str, Any]]]" = OrderedDict()
+        self._buckets: List[Dict[Tuple[int, ...], Set[str]]] = [{} for _ in range(bands)]
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            self._load()
+
+    def signature(self, features: Iterable[str]) -> Tuple[int, ...]:
+        """
+        计算特征集合的MinHash签名
+
+        参数:
+            features: 特征集合
+
+        返回:
+            Tuple[int, ...]: 长度为num_perm的签名
+        """
+        hashes = [
+            int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "big")
+            for feature in features
+        ]
+        if not hashes:
+            return (_MAX_HASH,) * self.num_perm
+        return tuple(
+            min(((a * h + b) % _MERSENNE_PRIME) & _MAX_HASH for h in hashes)
+            for a, b in self._permutations
+        )
+
+    def _bands(self, signature: Tuple[int, ...]) -> List[Tuple[int, ...]]:
+        """把签名切分为LSH分段"""
+        return [signature[i * self._rows:(i + 1) * self._rows] for i in range(self.bands)]
+
+    def query(self, features: Iterable[str]) -> Optional[Tuple[str, float, Dict[str, Any]]]:
+        """
+        查找与给定特征最相似且超过阈值的已分析告警
+
+        参数:
+            features: 待查询告警的特征集合
+
+        返回:
+            Optional[Tuple[str, float, Dict[str, Any]]]: (告警ID, 估计相似度, 保存的分析结论)，没有时返回None
+        """
+        signature = self.signature(features)
+        with self._lock:
+            candidates: Set[str] = set()
+            for bucket, band in zip(self._buckets, self._bands(signature)):
+                candidates.update(bucket.get(band, ()))
+            best = None
+            for entry_id in candidates:
+                other, payload = self._entries[entry_id]
+                similarity = sum(x == y for x, y in zip(signature, other)) / self.num_perm
+                if similarity >= self.threshold and (best is None or similarity > best[1]):
+                    best = (entry_id, similarity, payload)
+            if best is not None:
+                self._entries.move_to_end(best[0])
+            return best
+
+    def add(self, entry_id: str, features: Iterable[str], payload: Dict[str, Any]) -> None:
+        """
+        添加一条已分析告警
+
+        参数:
+            entry_id: 告警ID
+            features: 告警特征集合
+            payload: 需要复用的分析结论（需可JSON序列化）
+        """
+        self._insert(entry_id, self.signature(features), payload)
+
+    def _insert(self, entry_id: str, signature: Tuple[int, ...], payload: Dict[str, Any]) -> None:
+        """写入条目并在超出容量时淘汰最久未命中的条目"""
+        with self._lock:
+            if entry_id in self._entries:
+                self._remove(entry_id)
+            self._entries[entry_id] = (signature, payload)
+            for bucket, band in zip(self._buckets, self._bands(signature)):
+                bucket.setdefault(band, set()).add(entry_id)
+            while len(self._entries) > self.capacity:
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, entry_id: str) -> None:
+        """删除条目及其分段索引（调用方需持有锁）"""
+        signature, _ = self._entries.pop(entry_id)
+        for bucket, band in zip(self._buckets, self._bands(signature)):
+            members = bucket.get(band)
+            if members is not None:
+                members.discard(entry_id)
+                if not members:
+                    del bucket[band]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def save(self) -> None:
+        """把索引写入持久化文件，未配置路径时不做任何操作"""
+        if not self.path:
+            return
+        with self._lock:
+            data = {
+                "num_perm": self.num_perm,
+                "bands": self.bands,
+                "entries": [
+                    [entry_id, list(signature), payload]
+                    for entry_id, (signature, payload) in self._entries.items()
+                ]
+            }
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def _load(self) -> None:
+        """从持久化文件加载条目，签名参数不一致时忽略旧文件"""
+        if not self.path:
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("num_perm") != self.num_perm or data.get("bands") != self.bands:
+            return
+        for entry_id, signature, payload in data.get("entries", []):
+            self._insert(entry_id, tuple(signature), payload)
@@ -1,6 +1,7 @@
 import unittest
 from unittest.mock import Mock, patch
 import json
+import os
 from ai_analyzer import AIAnalyzer
 
 class TestAIAnalyzer(unittest.TestCase):
@@ -33,6 +34,31 @@ class TestAIAnalyzer(unittest.TestCase):
         self.assertEqual(formatted_dict["目标IP"], "10.0.0.1")
         self.assertEqual(formatted_dict["协议"], "TCP")
 
+    def test_format_wazuh_alert(self):
+        """测试Wazuh格式告警的字段提取"""
+        with open(os.path.join(os.path.dirname(__file__), "..", "sample_alert.json"), encoding="utf-8") as f:
+            alert = json.load(f)
+        formatted_dict = json.loads(self.analyzer._format_alert(alert))
+        
+        self.assertEqual(formatted_dict["告警类型"], "Suspicious SSH Brute Force Attempt")
+        self.assertEqual(formatted_dict["告警时间"], "2023-10-15T14:23:45.123Z")
+        self.assertEqual(formatted_dict["事件描述"], "Multiple failed SSH login attempts from a single source")
+        self.assertEqual(formatted_dict["目标服务"], "SSH")
+        self.assertEqual(formatted_dict["协议"], "未知")
+
+    def test_format_threat_intel(self):
+        """测试威胁情报格式化功能"""
+        threat_intel = {
+            "ip_info": {"country": "CN", "city": None, "org": "测试ISP", "error": None},
+            "vt_report": {"malicious": 5, "suspicious": 2, "detected_urls": 0, "detected_samples": 1, "error": None}
+        }
+        formatted_dict = json.loads(self.analyzer._format_threat_intel(threat_intel))
+        
+        self.assertEqual(formatted_dict["IP信息"]["国家"], "CN")
+        self.assertEqual(formatted_dict["IP信息"]["城市"], "未知")
+        self.assertEqual(formatted_dict["威胁情报"]["恶意评分"], 5)
+        self.assertEqual(formatted_dict["威胁情报"]["恶意样本数"], 1)
+
     def test_extract_decision(self):
         """测试响应决策提取功能"""
         # 测试标准格式
@@ -55,6 +81,10 @@ class TestAIAnalyzer(unittest.TestCase):
         self.assertFalse(decision)
         self.assertEqual(reason, "误报")
 
+        # 测试无法提取决策
+        decision, reason = self.analyzer._extract_decision("分析结果...")
+        self.assertIsNone(decision)
+
     @patch('ai_analyzer.Generation.call')
     @patch('ai_analyzer.ThreatIntel')
     def test_analyze_alert(self, mock_threat_intel, mock_generation):
@@ -93,6 +123,60 @@ class TestAIAnalyzer(unittest.TestCase):
         self.assertTrue(result["response_decision"]["should_respond"])
         self.assertEqual(result["response_decision"]["reason"], "确认是恶意IP")
 
+    def test_parse_packed_decisions(self):
+        """测试合并分析结果解析"""
+        content = """```json
+        [
+            {"id": "alert-1", "analysis": "报告1", "should_respond": true, "reason": "恶意IP"},
+            {"id": "alert-2", "analysis": "报告2", "should_respond": "否", "reason": "格式错误"},
+            {"id": "alert-9", "analysis": "报告9", "should_respond": false, "reason": "未知ID"}
+        ]
+        ```"""
+        decisions = self.analyzer._parse_packed_decisions(content, {"alert-1", "alert-2"})
+        
+        self.assertEqual(decisions, {"alert-1": ("报告1", True, "恶意IP")})
+        with self.assertRaises(ValueError):
+            self.analyzer._parse_packed_decisions("无法分析", {"alert-1"})
+
+    def test_packing_disabled_by_default(self):
+        """测试未指定合并数量时不开启合并分析，单条分析不会等待"""
+        with patch('ai_analyzer.settings.ANALYSIS_PACK_SIZE', 8):
+            self.assertIsNone(AIAnalyzer().packer)
+        self.assertIsNotNone(AIAnalyzer(pack_size=8).packer)
+
+    @patch('ai_analyzer.Generation.call')
+    def test_analyze_alert_reuses_similar(self, mock_generation):
+        """测试近似重复告警复用已有分析结论"""
+        analyzer = AIAnalyzer(reuse_similar=True)
+        threat_intel = {"ip_info": {"country": "CN"}, "vt_report": {"malicious": 0, "suspicious": 0}}
+        mock_generation.return_value.output.choices = [
+            Mock(message=Mock(content="分析结果...\n响应决策：是\n决策原因：确认是恶意IP"))
+        ]
+
+        first = analyzer.analyze_alert(self.sample_alert, threat_intel=threat_intel)
+        duplicate = json.loads(json.dumps(self.sample_alert))
+        duplicate["event"]["source"]["port"] = 23456
+        duplicate["timestamp"] = "2024-03-20T10:05:00Z"
+        second = analyzer.analyze_alert(duplicate, threat_intel=threat_intel)
+        
+        self.assertEqual(mock_generation.call_count, 1)
+        self.assertEqual(second["response_decision"], first["response_decision"])
+        self.assertIn("reused_from", second)
+
+    @patch('ai_analyzer.Generation.call')
+    def test_analyze_alert_skips_unparsed_decision(self, mock_generation):
+        """测试无法提取决策的结论不加入相似度索引"""
+        analyzer = AIAnalyzer(reuse_similar=True)
+        threat_intel = {"ip_info": {"country": "CN"}, "vt_report": {"malicious": 0, "suspicious": 0}}
+        mock_generation.return_value.output.choices = [Mock(message=Mock(content="分析结果..."))]
+
+        result = analyzer.analyze_alert(self.sample_alert, threat_intel=threat_intel)
+        analyzer.analyze_alert(self.sample_alert, threat_intel=threat_intel)
+
+        self.assertFalse(result["response_decision"]["should_respond"])
+        self.assertEqual(len(analyzer.similarity_index), 0)
+        self.assertEqual(mock_generation.call_count, 2)
+
     @patch('ai_analyzer.ResponseActions')
     def test_execute_response(self, mock_response_actions):
         """测试响应动作执行功能"""
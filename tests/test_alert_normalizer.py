@@ -0,0 +1,106 @@
+import json
+import os
+import unittest
+import alert_normalizer
+from alert_normalizer import detect_normalizer, get_normalizer, normalize_alert, register_normalizer
+
+class TestAlertNormalizer(unittest.TestCase):
+    def setUp(self):
+        with open(os.path.join(os.path.dirname(__file__), "..", "sample_alert.json"), encoding="utf-8") as f:
+            self.wazuh_alert = json.load(f)
+
+    def test_wazuh_sample(self):
+        """测试示例告警按Wazuh格式归一化"""
+        record = normalize_alert(self.wazuh_alert)
+
+        self.assertEqual(record.format, "wazuh")
+        self.assertEqual(record.rule_id, "IDS-2023-001")
+        self.assertEqual(record.timestamp, "2023-10-15T14:23:45.123Z")
+        self.assertEqual(record.source_ip, "192.168.1.100")
+        self.assertEqual(record.target_service, "SSH")
+        self.assertIn("sshd[1234]", record.raw_log)
+        self.assertIsNone(record.protocol)
+
+    def test_wazuh_native(self):
+        """测试Wazuh原生告警格式"""
+        alert = {
+            "timestamp": "2023-10-15T14:23:45.123+0000",
+            "rule": {"level": 10, "description": "sshd: brute force trying to get access", "id": "5712"},
+            "agent": {"id": "001", "name": "web-server-01", "ip": "10.0.0.5"},
+            "data": {"srcip": "192.168.1.100", "srcport": "54321"},
+            "full_log": "Failed password for root from 192.168.1.100 port 54321 ssh2",
+            "id": "1697379825.12345"
+        }
+        record = normalize_alert(alert)
+
+        self.assertEqual(record.format, "wazuh")
+        self.assertEqual(record.rule_id, "5712")
+        self.assertEqual(record.source_ip, "192.168.1.100")
+        self.assertEqual(record.target_ip, "10.0.0.5")
+
+    def test_suricata_eve(self):
+        """测试Suricata EVE告警格式"""
+        alert = {
+            "timestamp": "2023-10-15T14:23:45.123456+0000",
+            "flow_id": 1234567890,
+            "event_type": "alert",
+            "src_ip": "192.168.1.100",
+            "src_port": 54321,
+            "dest_ip": "10.0.0.5",
+            "dest_port": 22,
+            "proto": "TCP",
+            "app_proto": "ssh",
+            "alert": {"signature_id": 2001219, "signature": "ET SCAN Potential SSH Scan", "category": "Attempted Information Leak", "severity": 2}
+        }
+        record = normalize_alert(alert)
+
+        self.assertEqual(record.format, "suricata_eve")
+        self.assertEqual(record.alert_type, "ET SCAN Potential SSH Scan")
+        self.assertEqual(record.target_port, 22)
+        self.assertEqual(record.protocol, "TCP")
+
+    def test_elastic_ecs(self):
+        """测试Elastic ECS告警格式"""
+        alert = {
+            "@timestamp": "2023-10-15T14:23:45.123Z",
+            "ecs": {"version": "8.11.0"},
+            "event": {"id": "abc", "severity": 73, "original": "Failed password for root"},
+            "rule": {"id": "r-1", "name": "SSH Brute Force"},
+            "source": {"ip": "192.168.1.100", "port": 54321},
+            "destination": {"ip": "10.0.0.5", "port": 22},
+            "network": {"transport": "tcp", "protocol": "ssh"}
+        }
+        record = normalize_alert(alert)
+
+        self.assertEqual(record.format, "elastic_ecs")
+        self.assertEqual(record.rule_name, "SSH Brute Force")
+        self.assertEqual(record.target_ip, "10.0.0.5")
+        self.assertEqual(record.raw_log, "Failed password for root")
+
+    def test_generic_fallback(self):
+        """测试无法识别的告警按通用格式处理"""
+        alert = {"alert_type": "可疑连接", "event": {"source": {"ip": "1.2.3.4"}, "protocol": "TCP"}}
+        record = normalize_alert(alert)
+
+        self.assertEqual(record.format, "generic")
+        self.assertEqual(record.source_ip, "1.2.3.4")
+        self.assertIsNone(record.target_ip)
+
+    def test_explicit_format(self):
+        """测试指定格式时跳过检测"""
+        record = normalize_alert({"src_ip": "1.2.3.4"}, "suricata_eve")
+        self.assertEqual(record.source_ip, "1.2.3.4")
+        with self.assertRaises(ValueError):
+            get_normalizer("unknown")
+
+    def test_register_before_generic(self):
+        """测试新注册的格式在generic之前检测"""
+        normalizer = register_normalizer("custom_test", lambda alert: "custom" in alert, {"source_ip": ("custom.ip",)})
+        self.addCleanup(alert_normalizer._normalizers.remove, normalizer)
+        self.assertEqual(detect_normalizer({"custom": {"ip": "1.2.3.4"}}).name, "custom_test")
+        self.assertEqual(detect_normalizer({}).name, "generic")
+        with self.assertRaises(ValueError):
+            register_normalizer("broken", lambda alert: False, {"unknown_field": ("x",)})
+
+if __name__ == '__main__':
+    unittest.main()
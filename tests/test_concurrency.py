@@ -0,0 +1,101 @@
+import random
+import threading
+import time
+import unittest
+from concurrency import AdaptiveLimiter
+
+class TestAdaptiveLimiter(unittest.TestCase):
+    def setUp(self):
+        self.limiter = AdaptiveLimiter("test", initial_limit=4, min_limit=1, max_limit=8)
+
+    def test_increase_on_stable_latency(self):
+        """测试并发用满且延迟稳定时逐步提高并发上限"""
+        limiter = AdaptiveLimiter("test", initial_limit=1, min_limit=1, max_limit=8)
+        for _ in range(40):
+            with limiter.slot():
+                pass
+        self.assertGreater(limiter.limit, 1)
+        self.assertLessEqual(limiter.limit, 8)
+
+    def test_no_increase_when_uncontended(self):
+        """测试调用方并发低于上限时不提高并发上限"""
+        for _ in range(40):
+            with self.limiter.slot() as slot:
+                self.assertFalse(slot.contended)
+        self.assertLessEqual(self.limiter.limit, 4)
+
+    def test_timeout_status_counts_as_drop(self):
+        """测试网关超时状态码视为过载"""
+        with self.limiter.slot() as slot:
+            slot.observe_status(504)
+        self.assertEqual(self.limiter.limit, 2)
+
+    def _observe(self, limiter, latency):
+        """模拟一次并发已用满的成功调用"""
+        limiter._in_flight += 1
+        limiter._release(latency, False, True)
+
+    def test_noisy_latency_does_not_lower_limit(self):
+        """测试延迟正常波动但没有恶化时不降低并发上限"""
+        limiter = AdaptiveLimiter("test", initial_limit=4, min_limit=1, max_limit=32)
+        rng = random.Random(0)
+        for _ in range(2000):
+            self._observe(limiter, rng.uniform(3, 15))
+        self.assertGreaterEqual(limiter.limit, 4)
+
+    def test_decrease_on_latency_degradation(self):
+        """测试延迟持续恶化时降低并发上限"""
+        limiter = AdaptiveLimiter("test", initial_limit=16, min_limit=1, max_limit=16)
+        for _ in range(200):
+            self._observe(limiter, 1.0)
+        for _ in range(20):
+            self._observe(limiter, 5.0)
+        self.assertLess(limiter.limit, 16)
+
+    def test_backoff_on_throttle(self):
+        """测试遇到限流状态码时降低并发上限"""
+        with self.limiter.slot() as slot:
+            slot.observe_status(429)
+        self.assertEqual(self.limiter.limit, 2)
+        self.assertEqual(self.limiter.snapshot()["drops"], 1)
+
+    def test_backoff_on_error(self):
+        """测试调用异常时降低并发上限并继续抛出异常"""
+        with self.assertRaises(TimeoutError):
+            with self.limiter.slot():
+                raise TimeoutError("timeout")
+        self.assertEqual(self.limiter.limit, 2)
+
+    def test_never_below_min_limit(self):
+        """测试并发上限不低于最小值"""
+        for _ in range(10):
+            with self.limiter.slot() as slot:
+                slot.observe_status(503)
+        self.assertEqual(self.limiter.limit, 1)
+
+    def test_in_flight_bounded_by_limit(self):
+        """测试同时进行的调用数不超过并发上限"""
+        limiter = AdaptiveLimiter("test", initial_limit=2, min_limit=2, max_limit=2)
+        peak = []
+        lock = threading.Lock()
+        active = [0]
+
+        def call():
+            with limiter.slot():
+                with lock:
+                    active[0] += 1
+                    peak.append(active[0])
+                time.sleep(0.01)
+                with lock:
+                    active[0] -= 1
+
+        threads = [threading.Thread(target=call) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertLessEqual(max(peak), 2)
+        self.assertEqual(limiter.snapshot()["in_flight"], 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import Mock
+from alert_normalizer import normalize_alert
+from main import _process_alert
+from progress_journal import ProgressJournal
+
+class TestProcessAlert(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.journal = ProgressJournal(os.path.join(self.tmpdir.name, "journal.jsonl"))
+        self.alert = {"event": {"source": {"ip": "192.168.1.100"}}}
+        self.alert_id = ProgressJournal.digest(self.alert)
+        self.analyzer = Mock()
+        self.analyzer.normalize.side_effect = normalize_alert
+        self.analyzer.enrich_alert.return_value = {
+            "ip_info": {"country": "CN", "error": None},
+            "vt_report": {"malicious": 5, "error": None}
+        }
+        self.analyzer.analyze_alert.return_value = {
+            "analysis": "报告",
+            "threat_intel": {},
+            "response_decision": {"should_respond": True, "reason": "恶意IP"}
+        }
+
+    def tearDown(self):
+        self.journal.close()
+        self.tmpdir.cleanup()
+
+    def test_failed_block_not_journaled(self):
+        """测试封锁失败时不记录响应阶段"""
+        self.analyzer.execute_response.return_value = {"error": "连接防火墙失败"}
+
+        outcome = _process_alert(self.analyzer, self.journal, self.alert, False, [])
+
+        self.assertIn("error", outcome)
+        self.assertFalse(outcome["executed"])
+        self.assertFalse(self.journal.is_done(self.alert_id, "responded"))
+        self.assertTrue(self.journal.is_done(self.alert_id, "analyzed"))
+
+    def test_failed_intel_not_journaled(self):
+        """测试威胁情报查询失败时不记录情报阶段"""
+        self.analyzer.enrich_alert.return_value = {
+            "ip_info": {"country": None, "error": "timeout"},
+            "vt_report": {"malicious": 0, "error": None}
+        }
+        self.analyzer.execute_response.return_value = {"success": True}
+
+        _process_alert(self.analyzer, self.journal, self.alert, False, [])
+
+        self.assertFalse(self.journal.is_done(self.alert_id, "enriched"))
+        self.assertTrue(self.journal.is_done(self.alert_id, "responded"))
+
+    def test_missing_source_ip(self):
+        """测试缺少源IP时不执行响应动作也不记录响应阶段"""
+        alert = {"event": {"description": "无源IP"}}
+
+        outcome = _process_alert(self.analyzer, self.journal, alert, True, [])
+
+        self.assertIn("error", outcome)
+        self.analyzer.execute_response.assert_not_called()
+        self.assertFalse(self.journal.is_done(ProgressJournal.digest(alert), "responded"))
+
+    def test_resume_exports_responded_alert(self):
+        """测试响应已完成但结论未送达时只重新输出结论"""
+        self.analyzer.execute_response.return_value = {"success": True}
+        _process_alert(self.analyzer, self.journal, self.alert, False, [])
+        sink = Mock()
+
+        _process_alert(self.analyzer, self.journal, self.alert, False, [sink])
+
+        self.assertEqual(self.analyzer.execute_response.call_count, 1)
+        self.assertEqual(self.analyzer.analyze_alert.call_count, 1)
+        verdict = sink.write.call_args.args[0]
+        self.assertEqual(verdict["alert_id"], self.alert_id)
+        self.assertFalse(self.journal.is_done(self.alert_id, "exported"))
+        sink.write.call_args.kwargs["on_delivered"]()
+        self.assertTrue(self.journal.is_done(self.alert_id, "exported"))
+
+if __name__ == '__main__':
+    unittest.main()
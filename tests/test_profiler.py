@@ -0,0 +1,83 @@
+import os
+import socket
+import tempfile
+import threading
+import time
+import unittest
+import profiler
+from profiler import Profiler, upstream_timer
+
+class TestProfiler(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.prefix = os.path.join(self.tmpdir.name, "profile")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_upstream_timer_without_profiler(self):
+        """测试未开启性能分析时上游计时不做记录"""
+        self.assertIsNone(profiler._active)
+        with upstream_timer("dashscope"):
+            pass
+
+    def test_idle_threads_not_sampled(self):
+        """测试阻塞在Event.wait上的空闲线程不计入采样"""
+        idle = threading.Event()
+        thread = threading.Thread(target=idle.wait, name="idle")
+        thread.start()
+        p = Profiler(self.prefix, interval=0.001)
+        p.start()
+        time.sleep(0.05)
+        p.stop()
+        idle.set()
+        thread.join()
+
+        self.assertFalse(any(stack.rsplit(";", 1)[-1].startswith("wait (threading.py") for stack in p._stacks))
+
+    def test_io_wait_only_in_wall_samples(self):
+        """测试阻塞在socket读取上的线程只计入墙钟采样"""
+        server, client = socket.socketpair()
+        thread = threading.Thread(target=client.makefile("rb").read, args=(1,), name="io")
+        thread.start()
+        p = Profiler(self.prefix, interval=0.001)
+        p.start()
+        time.sleep(0.05)
+        p.stop()
+        server.sendall(b"x")
+        thread.join()
+        server.close()
+        client.close()
+
+        def blocked_in_socket(stacks):
+            return any("(socket.py:" in stack.rsplit(";", 1)[-1] for stack in stacks)
+
+        self.assertTrue(blocked_in_socket(p._wall_stacks))
+        self.assertFalse(blocked_in_socket(p._stacks))
+
+    def test_profile_outputs(self):
+        """测试性能分析输出折叠栈和摘要文件"""
+        p = Profiler(self.prefix, interval=0.001)
+        p.start()
+        with upstream_timer("virustotal"):
+            time.sleep(0.02)
+        data = [str(i) for i in range(10000)]
+        collapsed_path, wall_path, summary_path = p.stop()
+
+        self.assertIsNone(profiler._active)
+        with open(collapsed_path, encoding="utf-8") as f:
+            lines = f.read().splitlines()
+        self.assertTrue(lines)
+        stack, count = lines[0].rsplit(" ", 1)
+        self.assertIn(";", stack)
+        self.assertGreater(int(count), 0)
+        self.assertTrue(os.path.exists(wall_path))
+
+        with open(summary_path, encoding="utf-8") as f:
+            summary = f.read()
+        self.assertIn("virustotal", summary)
+        self.assertIn("内存分配最多的位置", summary)
+        self.assertEqual(len(data), 10000)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import os
+import tempfile
+import unittest
+from progress_journal import ProgressJournal, idempotency_key
+
+class TestProgressJournal(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "journal.jsonl")
+        self.alert_id = ProgressJournal.digest({"event": {"source": {"ip": "192.168.1.100"}}})
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_resume_restores_completed_stages(self):
+        """测试恢复时读取已完成的阶段"""
+        with ProgressJournal(self.path) as journal:
+            journal.record(self.alert_id, "enriched", {"ip_info": {"country": "CN"}})
+            journal.record(self.alert_id, "analyzed", {"analysis": "ok"})
+
+        with ProgressJournal(self.path, resume=True) as journal:
+            self.assertEqual(journal.get(self.alert_id, "enriched"), {"ip_info": {"country": "CN"}})
+            self.assertTrue(journal.is_done(self.alert_id, "analyzed"))
+            self.assertFalse(journal.is_done(self.alert_id, "responded"))
+
+    def test_overwrite_starts_fresh(self):
+        """测试指定清空时丢弃旧日志"""
+        with ProgressJournal(self.path) as journal:
+            journal.record(self.alert_id, "enriched", {})
+
+        with ProgressJournal(self.path, overwrite=True) as journal:
+            self.assertFalse(journal.is_done(self.alert_id, "enriched"))
+
+    def test_refuses_to_truncate_existing_journal(self):
+        """测试既不恢复也不清空时拒绝覆盖已有日志"""
+        with ProgressJournal(self.path) as journal:
+            journal.record(self.alert_id, "enriched", {})
+
+        with self.assertRaises(FileExistsError):
+            ProgressJournal(self.path)
+        with ProgressJournal(self.path, resume=True) as journal:
+            self.assertTrue(journal.is_done(self.alert_id, "enriched"))
+
+    def test_replay_skips_torn_and_corrupt_entries(self):
+        """测试恢复时丢弃写入不完整或摘要不匹配的记录"""
+        with ProgressJournal(self.path) as journal:
+            journal.record(self.alert_id, "enriched", {"ip_info": {}})
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write('{"alert_id": "%s", "stage": "analyzed", "digest": "bad", "data": {}}\n' % self.alert_id)
+            f.write('{"alert_id": "%s", "stage": "respon' % self.alert_id)
+
+        with ProgressJournal(self.path, resume=True) as journal:
+            self.assertTrue(journal.is_done(self.alert_id, "enriched"))
+            self.assertFalse(journal.is_done(self.alert_id, "analyzed"))
+            self.assertFalse(journal.is_done(self.alert_id, "responded"))
+
+    def test_record_unknown_stage(self):
+        """测试记录未知阶段时报错"""
+        with ProgressJournal(self.path) as journal:
+            with self.assertRaises(ValueError):
+                journal.record(self.alert_id, "unknown", {})
+
+    def test_idempotency_key_is_stable(self):
+        """测试幂等键对相同输入保持不变"""
+        key = idempotency_key(self.alert_id, "block_ip", "192.168.1.100")
+        self.assertEqual(key, idempotency_key(self.alert_id, "block_ip", "192.168.1.100"))
+        self.assertNotEqual(key, idempotency_key(self.alert_id, "block_ip", "192.168.1.101"))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+import threading
+import unittest
+from prompt_packing import PromptPacker
+
+class TestPromptPacker(unittest.TestCase):
+    def setUp(self):
+        self.packed_calls = []
+        self.single_calls = []
+
+    def _analyze_packed(self, items):
+        self.packed_calls.append(items)
+        return {alert_id: (f"packed:{alert}", True, "合并") for alert_id, alert, _ in items}
+
+    def _analyze_single(self, alert, threat_intel):
+        self.single_calls.append(alert)
+        return (f"single:{alert}", False, "单条")
+
+    def _run_concurrently(self, packer, alerts):
+        results = {}
+
+        def submit(alert):
+            results[alert] = packer.analyze(alert, "{}")
+
+        threads = [threading.Thread(target=submit, args=(alert,)) for alert in alerts]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return results
+
+    def test_pack_full_batch(self):
+        """测试达到合并数量时一次调用分析多条告警"""
+        packer = PromptPacker(self._analyze_packed, self._analyze_single, max_size=3, max_wait=5)
+        results = self._run_concurrently(packer, ["a", "b", "c"])
+
+        self.assertEqual(len(self.packed_calls), 1)
+        self.assertEqual(self.single_calls, [])
+        self.assertEqual(results["b"], ("packed:b", True, "合并"))
+
+    def test_flush_after_max_wait(self):
+        """测试等待超时后发送未满的批次"""
+        packer = PromptPacker(self._analyze_packed, self._analyze_single, max_size=10, max_wait=0.05)
+        results = self._run_concurrently(packer, ["a", "b"])
+
+        self.assertEqual(set(results), {"a", "b"})
+        self.assertEqual(sum(len(call) for call in self.packed_calls) + len(self.single_calls), 2)
+
+    def test_fallback_on_parse_failure(self):
+        """测试合并分析失败时退回单条分析"""
+        def broken(items):
+            raise ValueError("无法解析")
+
+        packer = PromptPacker(broken, self._analyze_single, max_size=2, max_wait=5)
+        results = self._run_concurrently(packer, ["a", "b"])
+
+        self.assertEqual(sorted(self.single_calls), ["a", "b"])
+        self.assertEqual(results["a"], ("single:a", False, "单条"))
+
+    def test_fallback_for_missing_alert(self):
+        """测试合并结果缺少某条告警时只对该告警单条分析"""
+        def partial(items):
+            return {items[0][0]: ("packed", True, "合并")}
+
+        packer = PromptPacker(partial, self._analyze_single, max_size=2, max_wait=5)
+        results = self._run_concurrently(packer, ["a", "b"])
+
+        self.assertEqual(len(self.single_calls), 1)
+        self.assertEqual(sorted(r[0] for r in results.values())[0], "packed")
+
+    def test_fallback_runs_in_parallel(self):
+        """测试退回单条分析时各告警由各自的线程并行分析"""
+        def broken(items):
+            raise ValueError("无法解析")
+
+        barrier = threading.Barrier(3, timeout=5)
+
+        def single(alert, threat_intel):
+            # 三条告警的单条分析必须同时进行才能通过屏障
+            barrier.wait()
+            return self._analyze_single(alert, threat_intel)
+
+        packer = PromptPacker(broken, single, max_size=3, max_wait=5)
+        results = self._run_concurrently(packer, ["a", "b", "c"])
+
+        self.assertEqual(sorted(self.single_calls), ["a", "b", "c"])
+        self.assertEqual(results["c"], ("single:c", False, "单条"))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -36,6 +36,16 @@ class TestResponseActions(unittest.TestCase):
         self.assertIn("error", result)
         self.assertEqual(result["error"], "API请求失败")
 
+    @patch('requests.post')
+    def test_block_ip_idempotency_key(self, mock_post):
+        """测试封锁IP时携带幂等键"""
+        mock_post.return_value.json.return_value = {"success": True}
+
+        self.response_actions.block_ip(self.test_ip, idempotency_key="key-1")
+        
+        _, kwargs = mock_post.call_args
+        self.assertEqual(kwargs["headers"], {"Idempotency-Key": "key-1"})
+
     @patch('requests.post')
     def test_unblock_ip_success(self, mock_post):
         """测试成功解除IP封锁"""
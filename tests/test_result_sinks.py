@@ -0,0 +1,118 @@
+import gzip
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import Mock, patch
+from result_sinks import (
+    ElasticsearchBulkSink,
+    FileSink,
+    LocalBulkServer,
+    ResultSink,
+    WebhookSink,
+    build_sink
+)
+
+class TestResultSinks(unittest.TestCase):
+    def setUp(self):
+        self.server = LocalBulkServer().start()
+        self.records = [{"alert_id": str(i), "executed": i % 2 == 0} for i in range(5)]
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_file_sink_gzip(self):
+        """测试压缩NDJSON文件输出"""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "results.ndjson.gz")
+            with FileSink(path, batch_size=2) as sink:
+                for record in self.records:
+                    sink.write(record)
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                lines = [json.loads(line) for line in f]
+        self.assertEqual(lines, self.records)
+
+    def test_elasticsearch_bulk_sink(self):
+        """测试按数量批量写入_bulk接口"""
+        with ElasticsearchBulkSink(self.server.url, "verdicts", batch_size=2, flush_interval=10) as sink:
+            for record in self.records:
+                sink.write(record)
+        self.assertEqual(self.server.documents, self.records)
+        self.assertEqual(self.server.requests, 3)
+
+    def test_webhook_sink_retry(self):
+        """测试服务端暂时不可用时重试"""
+        self.server.fail_next = 2
+        with WebhookSink(f"{self.server.url}/hook", retry_backoff=0.01) as sink:
+            for record in self.records:
+                sink.write(record)
+        self.assertEqual(self.server.documents, self.records)
+        self.assertEqual(sink.dropped, 0)
+
+    def test_retry_exhausted(self):
+        """测试重试耗尽后丢弃记录"""
+        self.server.fail_next = 10
+        with WebhookSink(self.server.url, max_retries=1, retry_backoff=0.01) as sink:
+            sink.write(self.records[0])
+        self.assertEqual(sink.dropped, 1)
+        self.assertEqual(self.server.documents, [])
+
+    def test_elasticsearch_document_id(self):
+        """测试_bulk请求使用告警摘要作为文档ID"""
+        with patch('result_sinks.requests.post') as mock_post:
+            mock_post.return_value = Mock(status_code=200, json=Mock(return_value={"errors": False}))
+            with ElasticsearchBulkSink(self.server.url, "verdicts") as sink:
+                sink.write(self.records[1])
+        action = json.loads(mock_post.call_args.kwargs["data"].decode("utf-8").splitlines()[0])
+        self.assertEqual(action, {"index": {"_index": "verdicts", "_id": "1"}})
+
+    def test_elasticsearch_rejected_not_retried(self):
+        """测试请求被拒绝时不重试且不回调"""
+        delivered = []
+        with patch('result_sinks.requests.post') as mock_post:
+            mock_post.return_value = Mock(status_code=413)
+            with ElasticsearchBulkSink(self.server.url, "verdicts", retry_backoff=0.01) as sink:
+                sink.write(self.records[0], on_delivered=lambda: delivered.append(0))
+        self.assertEqual(mock_post.call_count, 1)
+        self.assertEqual(sink.dropped, 1)
+        self.assertEqual(delivered, [])
+
+    def test_webhook_rejected_not_retried(self):
+        """测试Webhook请求被拒绝时不重试"""
+        with patch('result_sinks.requests.post') as mock_post:
+            mock_post.return_value = Mock(status_code=400)
+            with WebhookSink(self.server.url, retry_backoff=0.01, timeout=5) as sink:
+                sink.write(self.records[0])
+        self.assertEqual(mock_post.call_count, 1)
+        self.assertEqual(mock_post.call_args.kwargs["timeout"], 5)
+        self.assertEqual(sink.dropped, 1)
+
+    def test_on_delivered_after_retry(self):
+        """测试重试成功后回调送达"""
+        delivered = []
+        self.server.fail_next = 1
+        with WebhookSink(self.server.url, retry_backoff=0.01) as sink:
+            for record in self.records:
+                sink.write(record, on_delivered=lambda r=record: delivered.append(r["alert_id"]))
+        self.assertEqual(delivered, [r["alert_id"] for r in self.records])
+
+    def test_send_is_abstract(self):
+        """测试未实现_send的子类无法实例化"""
+        class IncompleteSink(ResultSink):
+            pass
+
+        with self.assertRaises(TypeError):
+            IncompleteSink()
+
+    def test_build_sink(self):
+        """测试根据描述创建结果输出"""
+        sink = build_sink(f"es:{self.server.url}/verdicts")
+        self.assertIsInstance(sink, ElasticsearchBulkSink)
+        self.assertEqual(sink.url, self.server.url)
+        self.assertEqual(sink.index, "verdicts")
+        sink.close()
+        with self.assertRaises(ValueError):
+            build_sink("kafka:topic")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import json
+import os
+import tempfile
+import unittest
+from alert_normalizer import normalize_alert
+from similarity_index import SimilarityIndex, alert_features
+
+class TestSimilarityIndex(unittest.TestCase):
+    def setUp(self):
+        with open(os.path.join(os.path.dirname(__file__), "..", "sample_alert.json"), encoding="utf-8") as f:
+            self.alert = json.load(f)
+        self.threat_intel = {
+            "ip_info": {"country": "CN"},
+            "vt_report": {"malicious": 3, "suspicious": 0}
+        }
+        self.index = SimilarityIndex(threshold=0.8, capacity=2)
+
+    def _variant(self, port, pid):
+        """生成只有源端口、进程号和事件ID不同的告警"""
+        alert = json.loads(json.dumps(self.alert))
+        alert["event"]["source"]["port"] = port
+        alert["event"]["event_id"] = f"event-{pid}"
+        alert["event"]["raw_log"]["original"] = (
+            f"Oct 15 14:25:{pid % 60:02d} web-server-01 sshd[{pid}]: "
+            f"Failed password for root from 192.168.1.100 port {port} ssh2"
+        )
+        return alert
+
+    def test_near_duplicate_reuse(self):
+        """测试近似重复告警命中已有结论"""
+        payload = {"analysis": "报告", "response_decision": {"should_respond": True, "reason": "暴力破解"}}
+        first = normalize_alert(self._variant(54321, 1234))
+        self.index.add("first", alert_features(first, self.threat_intel), payload)
+
+        second = normalize_alert(self._variant(40000, 5678))
+        match = self.index.query(alert_features(second, self.threat_intel))
+        
+        self.assertIsNotNone(match)
+        entry_id, similarity, reused = match
+        self.assertEqual(entry_id, "first")
+        self.assertGreaterEqual(similarity, 0.8)
+        self.assertEqual(reused, payload)
+
+    def test_different_alert_not_reused(self):
+        """测试不同规则和日志的告警不会命中"""
+        self.index.add("first", alert_features(normalize_alert(self.alert), self.threat_intel), {})
+        other = {
+            "alert_type": "可疑连接",
+            "event": {
+                "target": {"port": 80},
+                "description": "检测到可疑的远程连接尝试"
+            }
+        }
+        
+        self.assertIsNone(self.index.query(alert_features(normalize_alert(other), {})))
+
+    def test_capacity_evicts_least_recent(self):
+        """测试超出容量时淘汰最久未命中的条目"""
+        features = [alert_features(normalize_alert({"alert_type": name}), {}) for name in ("a", "b", "c")]
+        for name, feature in zip(("a", "b", "c"), features):
+            self.index.add(name, feature, {})
+        
+        self.assertEqual(len(self.index), 2)
+        self.assertIsNone(self.index.query(features[0]))
+        self.assertEqual(self.index.query(features[2])[0], "c")
+
+    def test_persistence(self):
+        """测试索引持久化和加载"""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "index.json")
+            index = SimilarityIndex(path=path)
+            features = alert_features(normalize_alert(self.alert), self.threat_intel)
+            index.add("first", features, {"analysis": "报告"})
+            index.save()
+
+            loaded = SimilarityIndex(path=path)
+            self.assertEqual(loaded.query(features)[0], "first")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,5 +1,6 @@
 import unittest
 from unittest.mock import patch, Mock
+from concurrency import get_limiter
 from threat_intel import ThreatIntel
 
 class TestThreatIntel(unittest.TestCase):
@@ -40,6 +41,17 @@ class TestThreatIntel(unittest.TestCase):
         self.assertIn("error", result)
         self.assertEqual(result["error"], "API请求失败")
 
+    @patch('requests.get')
+    def test_get_vt_ip_report_quota_exceeded(self, mock_get):
+        """测试VirusTotal以204空响应表示限流时返回错误并降低并发上限"""
+        mock_get.return_value = Mock(status_code=204, content=b"")
+        drops = get_limiter("virustotal").snapshot()["drops"]
+
+        result = self.threat_intel.get_vt_ip_report(self.test_ip)
+
+        self.assertIn("error", result)
+        self.assertEqual(get_limiter("virustotal").snapshot()["drops"], drops + 1)
+
     @patch('requests.get')
     def test_get_vt_ip_report_success(self, mock_get):
         """测试成功获取VirusTotal IP报告"""
@@ -90,6 +102,48 @@ class TestThreatIntel(unittest.TestCase):
         self.assertIn("last_analysis_stats", result["data"]["attributes"])
         mock_get.assert_called_once()
 
+    @patch('requests.get')
+    def test_lookup_ip_compact_record(self, mock_get):
+        """测试威胁情报解析为精简记录"""
+        ipinfo_response = Mock()
+        ipinfo_response.json.return_value = {
+            "ip": "8.8.8.8",
+            "city": "Mountain View",
+            "country": "US",
+            "org": "Google LLC",
+            "loc": "37.4056,-122.0775"
+        }
+        vt_response = Mock()
+        vt_response.json.return_value = {
+            "response_code": 1,
+            "resolutions": [{"hostname": "dns.google"}] * 100,
+            "detected_urls": [{"url": "http://example.com/"}] * 3,
+            "detected_communicating_samples": [{"sha256": "a"}] * 2
+        }
+        mock_get.side_effect = [ipinfo_response, vt_response]
+
+        record = self.threat_intel.lookup_ip(self.test_ip)
+        
+        self.assertEqual(record.ip_info.country, "US")
+        self.assertEqual(record.vt_report.detected_urls, 3)
+        self.assertEqual(record.vt_report.detected_samples, 2)
+        self.assertIsNone(record.raw)
+        self.assertNotIn("raw", record.to_dict())
+        self.assertEqual(record.to_dict()["ip_info"]["org"], "Google LLC")
+
+    @patch('requests.get')
+    def test_lookup_ip_keep_raw(self, mock_get):
+        """测试按需保留原始响应"""
+        mock_get.return_value.json.return_value = {
+            "data": {"attributes": {"last_analysis_stats": {"malicious": 5, "suspicious": 2}}}
+        }
+
+        record = self.threat_intel.lookup_ip(self.test_ip, keep_raw=True)
+        
+        self.assertEqual(record.vt_report.malicious, 5)
+        self.assertEqual(record.vt_report.suspicious, 2)
+        self.assertIn("vt_report", record.to_dict()["raw"])
+
     def test_get_ip_info_no_api_key(self):
         """测试没有API密钥时获取IP信息"""
         self.threat_intel.ipinfo_api_key = None
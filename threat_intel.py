@@ -1,8 +1,94 @@
 import requests
-from typing import Dict, Optional
+from dataclasses import dataclass, asdict
+from typing import Any, Dict, Optional
 from config import settings
+from profiler import upstream_timer
+from concurrency import get_limiter
 import time
 
+@dataclass(slots=True)
+class IPInfoRecord:
+    """
+    IPInfo查询结果的精简记录，仅保留分析所需字段
+
+    属性:
+        country: 国家
+        city: 城市
+        org: ISP/ASN信息
+        error: 查询失败时的错误信息
+    """
+    country: Optional[str] = None
+    city: Optional[str] = None
+    org: Optional[str] = None
+    error: Optional[str] = None
+
+    @classmethod
+    def from_response(cls, data: Dict[str, Any]) -> "IPInfoRecord":
+        """从IPInfo原始响应中提取字段"""
+        return cls(
+            country=data.get("country"),
+            city=data.get("city"),
+            org=data.get("org"),
+            error=data.get("error")
+        )
+
+@dataclass(slots=True)
+class VTIPRecord:
+    """
+    VirusTotal IP报告的精简记录
+
+    同时兼容v3接口的last_analysis_stats和v2接口的检出列表，
+    v2中体积较大的URL和样本列表只保留数量。
+
+    属性:
+        malicious: 恶意检出数
+        suspicious: 可疑检出数
+        detected_urls: 检出的恶意URL数量
+        detected_samples: 检出的关联恶意样本数量
+        error: 查询失败时的错误信息
+    """
+    malicious: int = 0
+    suspicious: int = 0
+    detected_urls: int = 0
+    detected_samples: int = 0
+    error: Optional[str] = None
+
+    @classmethod
+    def from_response(cls, data: Dict[str, Any]) -> "VTIPRecord":
+        """从VirusTotal原始响应中提取字段"""
+        stats = data.get("data", {}).get("attributes", {}).get("last_analysis_stats", {})
+        return cls(
+            malicious=stats.get("malicious", 0),
+            suspicious=stats.get("suspicious", 0),
+            detected_urls=len(data.get("detected_urls") or ()),
+            detected_samples=len(data.get("detected_downloaded_samples") or ())
+            + len(data.get("detected_communicating_samples") or ()),
+            error=data.get("error")
+        )
+
+@dataclass(slots=True)
+class IPThreatRecord:
+    """
+    单个IP的威胁情报汇总记录
+
+    属性:
+        ip: IP地址
+        ip_info: IPInfo精简记录
+        vt_report: VirusTotal精简记录
+        raw: 原始响应，仅在显式要求时保留
+    """
+    ip: str
+    ip_info: IPInfoRecord
+    vt_report: VTIPRecord
+    raw: Optional[Dict[str, Any]] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为可JSON序列化的字典，未保留原始响应时不包含raw字段"""
+        data = asdict(self)
+        if self.raw is None:
+            del data["raw"]
+        return data
+
 class ThreatIntel:
     """
     威胁情报服务类
@@ -35,14 +121,40 @@ class ThreatIntel:
             return {"error": "IPInfo API key not configured"}
             
         try:
-            response = requests.get(
-                f"https://ipinfo.io/{ip}",
-                headers={"Authorization": f"Bearer {self.ipinfo_api_key}"}
-            )
-            return response.json()
+            with get_limiter("ipinfo").slot() as slot, upstream_timer("ipinfo"):
+                response = requests.get(
+                    f"https://ipinfo.io/{ip}",
+                    headers={"Authorization": f"Bearer {self.ipinfo_api_key}"},
+                    timeout=settings.UPSTREAM_TIMEOUT
+                )
+                slot.observe_response(response)
+                if slot.throttled:
+                    return {"error": f"IPInfo请求被限流（HTTP {response.status_code}）"}
+                # 在名额内解析，响应体无效时计为一次失败
+                return response.json()
         except Exception as e:
             return {"error": str(e)}
     
+    def lookup_ip(self, ip: str, keep_raw: bool = False) -> IPThreatRecord:
+        """
+        查询IP的威胁情报并解析为精简记录
+        
+        参数:
+            ip: 要查询的IP地址
+            keep_raw: 是否在记录中保留原始响应
+            
+        返回:
+            IPThreatRecord: 威胁情报汇总记录
+        """
+        ip_info = self.get_ip_info(ip)
+        vt_report = self.get_vt_ip_report(ip)
+        return IPThreatRecord(
+            ip=ip,
+            ip_info=IPInfoRecord.from_response(ip_info),
+            vt_report=VTIPRecord.from_response(vt_report),
+            raw={"ip_info": ip_info, "vt_report": vt_report} if keep_raw else None
+        )
+    
     def get_vt_ip_report(self, ip: str) -> Dict:
         """
         获取VirusTotal的IP报告
@@ -57,11 +169,16 @@ class ThreatIntel:
             return {"error": "VirusTotal API key not configured"}
             
         try:
-            response = requests.get(
-                f"https://www.virustotal.com/vtapi/v2/ip-address/report",
-                params={"apikey": self.vt_api_key, "ip": ip}
-            )
-            return response.json()
+            with get_limiter("virustotal").slot() as slot, upstream_timer("virustotal"):
+                response = requests.get(
+                    f"https://www.virustotal.com/vtapi/v2/ip-address/report",
+                    params={"apikey": self.vt_api_key, "ip": ip},
+                    timeout=settings.UPSTREAM_TIMEOUT
+                )
+                slot.observe_response(response)
+                if slot.throttled:
+                    return {"error": f"VirusTotal请求被限流或配额耗尽（HTTP {response.status_code}）"}
+                return response.json()
         except Exception as e:
             return {"error": str(e)}
     
@@ -79,10 +196,15 @@ class ThreatIntel:
             return {"error": "VirusTotal API key not configured"}
             
         try:
-            response = requests.get(
-                f"https://www.virustotal.com/vtapi/v2/file/report",
-                params={"apikey": self.vt_api_key, "resource": file_hash}
-            )
-            return response.json()
+            with get_limiter("virustotal").slot() as slot, upstream_timer("virustotal"):
+                response = requests.get(
+                    f"https://www.virustotal.com/vtapi/v2/file/report",
+                    params={"apikey": self.vt_api_key, "resource": file_hash},
+                    timeout=settings.UPSTREAM_TIMEOUT
+                )
+                slot.observe_response(response)
+                if slot.throttled:
+                    return {"error": f"VirusTotal请求被限流或配额耗尽（HTTP {response.status_code}）"}
+                return response.json()
         except Exception as e:
             return {"error": str(e)} 
\ No newline at end of file